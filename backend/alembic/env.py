@@ -1,16 +1,20 @@
 """
 Alembic migration environment configuration.
 """
+import asyncio
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
+from sqlalchemy import inspect
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
 # Import models and settings
 from app.core.config import settings
-from app.core.database import Base
+from app.core.database import Base, PRE_MIGRATIONS_REVISION
 from app.models import User, SPO, Specialty, Student, Settings  # noqa: F401
 
 # this is the Alembic Config object
@@ -50,12 +54,53 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def _stamp_unversioned_schema(connection) -> None:
+    """
+    Databases built by create_all (before migrations ran at deploy time) have the
+    tables of revision PRE_MIGRATIONS_REVISION but no alembic_version table.
+    Record them at that revision, so the upgrade applies only the later
+    migrations instead of failing on the tables 001 would create.
+    """
+    inspector = inspect(connection)
+    if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+        context.get_context().stamp(context.script, PRE_MIGRATIONS_REVISION)
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata
+    )
+
+    with context.begin_transaction():
+        _stamp_unversioned_schema(connection)
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Run migrations through an async driver (the application's asyncpg URL)."""
+    connectable = async_engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
     In this scenario we need to create an Engine
     and associate a connection with the context.
     """
+    if make_url(config.get_main_option("sqlalchemy.url")).get_dialect().is_async:
+        asyncio.run(run_async_migrations())
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -63,13 +108,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,46 @@
+"""Add denormalized spo_id to students
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Add column as nullable first, backfill from specialties, then enforce NOT NULL
+    op.add_column('students', sa.Column('spo_id', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE students SET spo_id = specialties.spo_id "
+        "FROM specialties WHERE specialties.id = students.specialty_id"
+    )
+    op.alter_column('students', 'spo_id', nullable=False)
+
+    op.create_foreign_key(
+        'fk_students_spo_id',
+        'students', 'spo',
+        ['spo_id'], ['id'],
+        ondelete='CASCADE'
+    )
+
+    # Composite indexes for SPO-scoped operator queries
+    op.create_index('ix_students_spo_created', 'students', ['spo_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_students_spo_specialty', 'students', ['spo_id', 'specialty_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_students_spo_specialty', table_name='students')
+    op.drop_index('ix_students_spo_created', table_name='students')
+    op.drop_constraint('fk_students_spo_id', 'students', type_='foreignkey')
+    op.drop_column('students', 'spo_id')
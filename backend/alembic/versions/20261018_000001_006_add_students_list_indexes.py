@@ -0,0 +1,35 @@
+"""Add indexes for server-side sorting and filtering of students
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:01.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # sort=name / sort=certificate within an SPO
+    op.create_index('ix_students_spo_name', 'students', ['spo_id', 'last_name', 'first_name', 'id'], unique=False)
+    op.create_index('ix_students_spo_certificate', 'students', ['spo_id', 'certificate_number'], unique=False)
+
+    # Case-insensitive last name prefix search (LIKE 'x%' needs pattern ops)
+    op.execute(
+        "CREATE INDEX ix_students_spo_last_name_search "
+        "ON students (spo_id, lower(last_name) varchar_pattern_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_students_spo_last_name_search")
+    op.drop_index('ix_students_spo_certificate', table_name='students')
+    op.drop_index('ix_students_spo_name', table_name='students')
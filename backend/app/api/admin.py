@@ -8,13 +8,14 @@ from typing import List
 from urllib.parse import quote
 from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select, func, update, delete
+from sqlalchemy import select, func, update, delete, insert, literal, cast, Integer
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_admin
-from app.models import User, UserRole, SPO, SpecialtyTemplate, Specialty, Student
+from app.api.deps import get_db, get_read_db, get_current_admin
+from app.models import User, UserRole, SPO, SpecialtyTemplate, Specialty, Student, Settings
 from app.schemas import (
     SPOCreate, SPOUpdate, SPOResponse, SPOWithStats,
     UserCreate, UserResponse, UserWithPassword,
@@ -23,9 +24,18 @@ from app.schemas import (
     SpecialtyAssign, QuotaUpdate, SpecialtyResponse, SpecialtyWithStats,
     SettingsResponse, SettingsUpdate
 )
-from app.services import create_operator, reset_password, get_base_quota, set_base_quota
+from app.services import (
+    create_operator,
+    provision_operators,
+    reset_password,
+    get_base_quota,
+    set_base_quota,
+    revoke_user_refresh_tokens
+)
+from app.core.config import settings as app_settings
 from app.services.docx_export import build_credentials_docx
-from app.core.cache import cached, invalidate
+from app.core.cache import cached, invalidate, invalidate_principals
+from app.core.profiling import get_profile
 
 
 logger = logging.getLogger(__name__)
@@ -39,7 +49,7 @@ router = APIRouter(prefix="/api/admin", tags=["Admin"])
 @router.get("/spo", response_model=List[SPOWithStats])
 @cached("admin:spo")
 async def list_spo(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
@@ -56,14 +66,13 @@ async def list_spo(
         .subquery()
     )
 
-    # Subquery: count students per SPO (via specialty)
+    # Subquery: count students per SPO (denormalized spo_id, no join)
     students_subq = (
         select(
-            Specialty.spo_id,
+            Student.spo_id,
             func.count(Student.id).label("students_count")
         )
-        .join(Student, Student.specialty_id == Specialty.id)
-        .group_by(Specialty.spo_id)
+        .group_by(Student.spo_id)
         .subquery()
     )
 
@@ -117,10 +126,9 @@ async def create_spo(
     """
     Create new SPO.
     """
-    spo = SPO(name=spo_data.name)
-    db.add(spo)
+    result = await db.execute(insert(SPO).values(name=spo_data.name).returning(SPO))
+    spo = result.scalars().one()
     await db.commit()
-    await db.refresh(spo)
     await invalidate("admin:spo", "stats")
     return spo
 
@@ -128,7 +136,7 @@ async def create_spo(
 @router.get("/spo/{spo_id}", response_model=SPOWithStats)
 async def get_spo(
     spo_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
@@ -148,7 +156,7 @@ async def get_spo(
     specialties_count = spec_count_result.scalar()
 
     stud_count_result = await db.execute(
-        select(func.count(Student.id)).join(Specialty).where(Specialty.spo_id == spo.id)
+        select(func.count(Student.id)).where(Student.spo_id == spo.id)
     )
     students_count = stud_count_result.scalar()
 
@@ -212,19 +220,22 @@ async def delete_spo(
         )
 
     # Remove operators assigned to this SPO
-    await db.execute(delete(User).where(User.spo_id == spo_id))
+    result = await db.execute(delete(User).where(User.spo_id == spo_id).returning(User.id))
+    operator_ids = result.scalars().all()
 
     # SPO deletion will cascade to specialties and students
     await db.delete(spo)
     await db.commit()
     await invalidate("admin:spo", "stats")
+    await invalidate_principals(*operator_ids)
+    await revoke_user_refresh_tokens(*operator_ids)
 
 
 # ==================== Operators Management ====================
 
 @router.get("/operators", response_model=List[UserResponse])
 async def list_operators(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
@@ -243,31 +254,35 @@ async def create_operator_endpoint(
 ):
     """
     Create new operator for SPO. Returns generated login and password.
-    Each SPO can have only one operator.
+    Each SPO can have only one operator (enforced by the unique operator index).
     """
-    # Check if SPO exists
-    result = await db.execute(select(SPO).where(SPO.id == user_data.spo_id))
-    spo = result.scalars().first()
-    if not spo:
+    # SPO name is needed for login generation, so this doubles as the existence check
+    result = await db.execute(select(SPO.name).where(SPO.id == user_data.spo_id))
+    spo_name = result.scalar()
+    if spo_name is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Учреждение не найдено"
         )
 
-    # Check if SPO already has an operator
-    result = await db.execute(
-        select(User).where(User.spo_id == user_data.spo_id, User.role == UserRole.OPERATOR)
-    )
-    existing_operator = result.scalars().first()
-    if existing_operator:
+    # Create operator with generated credentials
+    try:
+        user, password = await create_operator(db, user_data.spo_id, spo_name)
+    except IntegrityError:
+        # Either the SPO already has an operator or the generated login was taken concurrently
+        result = await db.execute(
+            select(User.id).where(User.spo_id == user_data.spo_id, User.role == UserRole.OPERATOR)
+        )
+        if result.scalar() is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="У этого учреждения уже есть оператор"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="У этого учреждения уже есть оператор"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Не удалось создать оператора, повторите попытку"
         )
 
-    # Create operator with generated credentials
-    user, password = await create_operator(db, user_data.spo_id, spo.name)
-
     await invalidate("admin:spo")
     return UserWithPassword(
         id=user.id,
@@ -286,7 +301,9 @@ async def create_operators_bulk(
 ):
     """
     Create operator accounts for every SPO that doesn't yet have one.
-    Returns the list of newly created credentials.
+    All operators are created in a single transaction (passwords are hashed
+    in parallel off the event loop). Returns the list of newly created credentials;
+    SPOs that got an operator concurrently are skipped and listed in skipped_spo_ids.
     """
     operators_subq = (
         select(User.spo_id)
@@ -294,22 +311,41 @@ async def create_operators_bulk(
         .subquery()
     )
     result = await db.execute(
-        select(SPO).where(SPO.id.notin_(select(operators_subq.c.spo_id))).order_by(SPO.name)
+        select(SPO.id, SPO.name).where(SPO.id.notin_(select(operators_subq.c.spo_id))).order_by(SPO.name)
     )
-    spo_without_operator = result.scalars().all()
+    spo_without_operator = result.all()
 
     created: list[OperatorCredential] = []
     skipped_spo_ids: list[int] = []
-    for spo in spo_without_operator:
+    pending = [(spo.id, spo.name) for spo in spo_without_operator]
+    try:
+        operators = await provision_operators(db, pending)
+    except IntegrityError:
+        # The batch was rolled back: another admin created an operator for one of
+        # these SPOs (or took a generated login) concurrently. Skip the SPOs that
+        # have an operator now and retry the rest once.
+        result = await db.execute(
+            select(User.spo_id).where(
+                User.role == UserRole.OPERATOR, User.spo_id.in_([spo_id for spo_id, _ in pending])
+            )
+        )
+        provisioned = set(result.scalars().all())
+        skipped_spo_ids = [spo_id for spo_id, _ in pending if spo_id in provisioned]
+        pending = [(spo_id, spo_name) for spo_id, spo_name in pending if spo_id not in provisioned]
         try:
-            user, password = await create_operator(db, spo.id, spo.name)
-        except Exception:
-            logger.exception("Bulk operator creation failed for SPO id=%s", spo.id)
-            skipped_spo_ids.append(spo.id)
-            continue
+            operators = await provision_operators(db, pending)
+        except IntegrityError:
+            logger.warning("Bulk operator creation conflicted twice, nothing was created")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Не удалось создать операторов, повторите попытку"
+            )
+
+    spo_names = {spo.id: spo.name for spo in spo_without_operator}
+    for user, password in operators:
         created.append(OperatorCredential(
-            spo_id=spo.id,
-            spo_name=spo.name,
+            spo_id=user.spo_id,
+            spo_name=spo_names[user.spo_id],
             login=user.login,
             password=password,
         ))
@@ -368,6 +404,8 @@ async def delete_operator(
     await db.delete(operator)
     await db.commit()
     await invalidate("admin:spo")
+    await invalidate_principals(operator_id)
+    await revoke_user_refresh_tokens(operator_id)
 
 
 @router.post("/operators/{operator_id}/reset-password", response_model=UserWithPassword)
@@ -391,6 +429,8 @@ async def reset_operator_password(
         )
 
     user, password = await reset_password(db, operator_id)
+    await invalidate_principals(operator_id)
+    await revoke_user_refresh_tokens(operator_id)
 
     return UserWithPassword(
         id=user.id,
@@ -414,7 +454,12 @@ async def update_specialty_quota(
     """
     Update specialty quota.
     """
-    result = await db.execute(select(Specialty).where(Specialty.id == specialty_id))
+    result = await db.execute(
+        update(Specialty)
+        .where(Specialty.id == specialty_id)
+        .values(quota=quota_data.quota)
+        .returning(Specialty)
+    )
     specialty = result.scalars().first()
     if not specialty:
         raise HTTPException(
@@ -422,9 +467,7 @@ async def update_specialty_quota(
             detail="Specialty not found"
         )
 
-    specialty.quota = quota_data.quota
     await db.commit()
-    await db.refresh(specialty)
     await invalidate("admin:specialties", "op:specialties", "stats")
     return specialty
 
@@ -462,7 +505,7 @@ async def update_settings(
 @router.get("/specialty-templates", response_model=List[SpecialtyTemplateWithUsage])
 @cached("admin:templates", ttl=600)
 async def list_specialty_templates(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
@@ -508,25 +551,22 @@ async def create_specialty_template(
 ):
     """
     Create new specialty template in the global catalog.
+    Duplicate codes are rejected by the unique index on code.
     """
-    # Check for duplicate code
-    result = await db.execute(
-        select(SpecialtyTemplate).where(SpecialtyTemplate.code == template_data.code)
-    )
-    existing = result.scalars().first()
-    if existing:
+    try:
+        result = await db.execute(
+            insert(SpecialtyTemplate)
+            .values(code=template_data.code, name=template_data.name)
+            .returning(SpecialtyTemplate)
+        )
+        template = result.scalars().one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Специальность/профессия с кодом '{template_data.code}' уже существует"
         )
-
-    template = SpecialtyTemplate(
-        code=template_data.code,
-        name=template_data.name
-    )
-    db.add(template)
-    await db.commit()
-    await db.refresh(template)
     await invalidate("admin:templates")
     return template
 
@@ -610,7 +650,7 @@ async def delete_specialty_template(
 @cached("admin:specialties")
 async def list_all_specialties(
     spo_id: int = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
@@ -627,9 +667,17 @@ async def list_all_specialties(
         .subquery()
     )
 
+    # Plain column select (Core rows, no ORM entities); payload dicts are
+    # built straight from the row mappings
     stmt = (
         select(
-            Specialty,
+            Specialty.id,
+            Specialty.spo_id,
+            Specialty.template_id,
+            Specialty.code,
+            Specialty.name,
+            Specialty.quota,
+            Specialty.created_at,
             func.coalesce(students_count_subq.c.students_count, 0).label("students_count"),
             SPO.name.label("spo_name")
         )
@@ -640,23 +688,13 @@ async def list_all_specialties(
         stmt = stmt.where(Specialty.spo_id == spo_id)
 
     result = await db.execute(stmt)
-    rows = result.all()
 
-    return [
-        SpecialtyWithStats(
-            id=specialty.id,
-            spo_id=specialty.spo_id,
-            template_id=specialty.template_id,
-            code=specialty.code,
-            name=specialty.name,
-            quota=specialty.quota,
-            created_at=specialty.created_at,
-            students_count=students_count,
-            available_slots=max(0, specialty.quota - students_count),
-            spo_name=spo_name
-        )
-        for specialty, students_count, spo_name in rows
-    ]
+    specialties = []
+    for row in result.mappings():
+        specialty = dict(row)
+        specialty["available_slots"] = max(0, row["quota"] - row["students_count"])
+        specialties.append(specialty)
+    return specialties
 
 
 @router.post("/specialties", response_model=SpecialtyResponse, status_code=status.HTTP_201_CREATED)
@@ -667,49 +705,53 @@ async def assign_specialty_to_spo(
 ):
     """
     Assign specialty template to SPO with quota.
-    """
-    # Check template exists
-    result = await db.execute(select(SpecialtyTemplate).where(SpecialtyTemplate.id == data.template_id))
-    template = result.scalars().first()
-    if not template:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Специальность/профессия не найдена в справочнике"
+    Single INSERT ... SELECT ... RETURNING: template/SPO existence is implied by
+    the SELECT returning a row, duplicates are rejected by uq_specialty_spo_template.
+    """
+    # Quota from request or, if not provided, from settings (inside the same statement)
+    if data.quota is not None:
+        quota = literal(data.quota)
+    else:
+        quota = func.coalesce(
+            select(cast(Settings.value, Integer)).where(Settings.key == "base_quota").scalar_subquery(),
+            app_settings.DEFAULT_BASE_QUOTA
         )
 
-    # Check SPO exists
-    result = await db.execute(select(SPO).where(SPO.id == data.spo_id))
-    spo = result.scalars().first()
-    if not spo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Учреждение не найдено"
+    stmt = (
+        insert(Specialty)
+        .from_select(
+            ["spo_id", "template_id", "code", "name", "quota"],
+            select(SPO.id, SpecialtyTemplate.id, SpecialtyTemplate.code, SpecialtyTemplate.name, quota)
+            .select_from(SPO)
+            .join(SpecialtyTemplate, SpecialtyTemplate.id == data.template_id)
+            .where(SPO.id == data.spo_id)
         )
-
-    # Check if already assigned
-    result = await db.execute(
-        select(Specialty).where(Specialty.spo_id == data.spo_id, Specialty.template_id == data.template_id)
+        .returning(Specialty)
     )
-    existing = result.scalars().first()
-    if existing:
+    try:
+        result = await db.execute(stmt)
+        specialty = result.scalars().first()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Эта специальность/профессия уже прикреплена к данному учреждению"
         )
 
-    # Get quota from settings if not provided
-    quota = data.quota if data.quota is not None else await get_base_quota(db)
+    if specialty is None:
+        # Nothing inserted: find out which side is missing (error path only)
+        result = await db.execute(select(SpecialtyTemplate.id).where(SpecialtyTemplate.id == data.template_id))
+        if result.scalar() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Специальность/профессия не найдена в справочнике"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Учреждение не найдено"
+        )
 
-    specialty = Specialty(
-        spo_id=data.spo_id,
-        template_id=data.template_id,
-        code=template.code,
-        name=template.name,
-        quota=quota
-    )
-    db.add(specialty)
     await db.commit()
-    await db.refresh(specialty)
     await invalidate("admin:specialties", "op:specialties", "stats", "admin:spo")
     return specialty
 
@@ -734,3 +776,23 @@ async def unassign_specialty_from_spo(
     await db.delete(specialty)
     await db.commit()
     await invalidate("admin:specialties", "op:specialties", "stats", "admin:spo")
+
+
+# ==================== Diagnostics ====================
+
+@router.get("/profiles/{request_id}")
+async def get_request_profile(
+    request_id: str,
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Profiling report of a request sent with "X-Profile: 1" (see app.core.profiling):
+    an HTML call tree from pyinstrument, or cProfile statistics as text.
+    """
+    report = await get_profile(request_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Профиль не найден или устарел"
+        )
+    return Response(content=report["body"], media_type=report["content_type"])
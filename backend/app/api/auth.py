@@ -1,59 +1,42 @@
 """
 Authentication API endpoints.
 """
-from collections import defaultdict
-from time import time
-
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_user
 from app.models import User
-from app.schemas import UserLogin, TokenResponse, CurrentUser
-from app.services import authenticate_user
+from app.schemas import UserLogin, TokenResponse, RefreshTokenRequest, CurrentUser
+from app.services import (
+    authenticate_user,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token
+)
 from app.core.security import create_access_token
+from app.core.rate_limit import SlidingWindowLimiter, retry_after_header
 
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
-# In-memory rate limiter for login endpoint
-_login_attempts: dict[str, list[float]] = defaultdict(list)
+# Login rate limiter: 5 attempts per minute per IP, shared across workers via Redis
 _MAX_LOGIN_ATTEMPTS = 5
 _LOGIN_WINDOW_SECONDS = 60
+_login_limiter = SlidingWindowLimiter("login", _MAX_LOGIN_ATTEMPTS, _LOGIN_WINDOW_SECONDS)
 
 
-_RATE_LIMIT_DICT_MAX_SIZE = 10_000
-
-
-def _evict_stale_entries(now: float) -> None:
-    """Drop IPs with no recent attempts. Called when the dict grows too large."""
-    stale = [
-        ip for ip, attempts in _login_attempts.items()
-        if not attempts or now - attempts[-1] >= _LOGIN_WINDOW_SECONDS
-    ]
-    for ip in stale:
-        del _login_attempts[ip]
-
-
-def _check_login_rate_limit(ip: str) -> None:
+async def _check_login_rate_limit(ip: str) -> None:
     """
     Check if the IP has exceeded the login rate limit.
     Raises HTTPException 429 if too many attempts.
     """
-    now = time()
-
-    if len(_login_attempts) > _RATE_LIMIT_DICT_MAX_SIZE:
-        _evict_stale_entries(now)
-
-    _login_attempts[ip] = [
-        t for t in _login_attempts[ip] if now - t < _LOGIN_WINDOW_SECONDS
-    ]
-    if len(_login_attempts[ip]) >= _MAX_LOGIN_ATTEMPTS:
+    retry_after = await _login_limiter.hit(ip)
+    if retry_after is not None:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many login attempts. Please try again later."
+            detail="Too many login attempts. Please try again later.",
+            headers=retry_after_header(retry_after)
         )
-    _login_attempts[ip].append(now)
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -67,7 +50,7 @@ async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depen
     if client_ip and "," in client_ip:
         client_ip = client_ip.split(",")[0].strip()
 
-    _check_login_rate_limit(client_ip)
+    await _check_login_rate_limit(client_ip)
 
     user = await authenticate_user(db, user_data.login, user_data.password)
     if not user:
@@ -78,7 +61,35 @@ async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depen
         )
 
     access_token = create_access_token(data={"sub": str(user.id)})
-    return TokenResponse(access_token=access_token)
+    refresh_token = await issue_refresh_token(user.id)
+    return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(data: RefreshTokenRequest):
+    """
+    Exchange a refresh token for a new access/refresh token pair.
+    The refresh token is single-use (rotated on every call); no password check.
+    """
+    rotated = await rotate_refresh_token(data.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    user_id, refresh_token = rotated
+    access_token = create_access_token(data={"sub": str(user_id)})
+    return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(data: RefreshTokenRequest):
+    """
+    Revoke a refresh token. The access token stays valid until it expires.
+    """
+    await revoke_refresh_token(data.refresh_token)
 
 
 @router.get("/me", response_model=CurrentUser)
@@ -1,6 +1,7 @@
 """
 API dependencies - common dependencies for endpoints.
 """
+from datetime import datetime
 from typing import AsyncGenerator
 
 from fastapi import Depends, HTTPException, status
@@ -8,7 +9,9 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import AsyncSessionLocal
+from app.core.cache import cache_principal, get_cached_principal
+from app.core.database import AsyncSessionLocal, ReplicaSessionLocal, is_primary_sticky
+from app.core.request_context import get_request_context
 from app.core.security import decode_access_token
 from app.models import User, UserRole
 
@@ -18,11 +21,45 @@ security = HTTPBearer()
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency to get async database session."""
+    """
+    Dependency to get async database session.
+    The session checks out a pool connection only on its first statement, so
+    requests answered from cache never take a connection.
+    """
     async with AsyncSessionLocal() as session:
         yield session
 
 
+def _principal_from_user(user: User) -> dict:
+    return {
+        "id": user.id,
+        "login": user.login,
+        "role": user.role.value,
+        "spo_id": user.spo_id,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def _bind_to_request(user: User) -> User:
+    """Record the authenticated user in the request context (logging, profiling)."""
+    context = get_request_context()
+    if context is not None:
+        context.user_id = user.id
+        context.role = user.role.value
+    return user
+
+
+def _user_from_principal(principal: dict) -> User:
+    """Build a detached User from a cached principal (no password hash, not in any session)."""
+    return User(
+        id=principal["id"],
+        login=principal["login"],
+        role=UserRole(principal["role"]),
+        spo_id=principal["spo_id"],
+        created_at=datetime.fromisoformat(principal["created_at"]) if principal["created_at"] else None,
+    )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
@@ -46,7 +83,14 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
+    user_id = int(user_id)
+    # Lets the session attribute committed writes to this user (replica stickiness)
+    db.info["user_id"] = user_id
+    principal = await get_cached_principal(user_id)
+    if principal is not None:
+        return _bind_to_request(_user_from_principal(principal))
+
+    result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalars().first()
     if user is None:
         raise HTTPException(
@@ -55,7 +99,28 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    return user
+    # End the read transaction so the connection goes back to the pool right away:
+    # a handler served from cache then holds none (expire_on_commit=False keeps user loaded)
+    await db.commit()
+
+    await cache_principal(user_id, _principal_from_user(user))
+    return _bind_to_request(user)
+
+
+async def get_read_db(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only endpoints: the read replica when configured, unless
+    the user committed a write within REPLICA_STICKY_SECONDS (read-your-writes);
+    otherwise the request's primary session.
+    """
+    if ReplicaSessionLocal is None or await is_primary_sticky(current_user.id):
+        yield db
+        return
+    async with ReplicaSessionLocal() as session:
+        yield session
 
 
 def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
@@ -1,16 +1,20 @@
 """
 Operator API endpoints - specialties viewing and students management.
 """
+from collections import Counter, defaultdict
+from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, delete, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_db, get_current_operator
+from app.api.deps import get_db, get_read_db, get_current_operator
 from app.models import User, Specialty, Student, SPO
 from app.schemas import (
     SpecialtyWithStats,
-    StudentCreate, StudentUpdate, StudentResponse, StudentWithSpecialty
+    StudentCreate, StudentUpdate, StudentResponse, StudentWithSpecialty,
+    StudentBatchRequest, StudentBatchResponse
 )
 from app.core.cache import cached, invalidate
 
@@ -18,12 +22,21 @@ from app.core.cache import cached, invalidate
 router = APIRouter(prefix="/api", tags=["Operator"])
 
 
+# Sort keys for the student list; each is backed by an (spo_id, ...) index on students.
+# Student.id is appended as a tiebreaker so pagination is stable.
+STUDENT_SORT_COLUMNS = {
+    "name": (Student.last_name, Student.first_name, Student.id),
+    "certificate": (Student.certificate_number,),
+    "created_at": (Student.created_at, Student.id),
+}
+
+
 # ==================== Specialties Viewing (Read-Only) ====================
 
 @router.get("/specialties", response_model=List[SpecialtyWithStats])
 @cached("op:specialties")
 async def list_specialties(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_operator)
 ):
     """
@@ -36,6 +49,7 @@ async def list_specialties(
             Student.specialty_id,
             func.count(Student.id).label("students_count")
         )
+        .where(Student.spo_id == current_user.spo_id)
         .group_by(Student.specialty_id)
         .subquery()
     )
@@ -74,58 +88,88 @@ async def list_specialties(
 @cached("op:students", ttl=120)
 async def list_students(
     specialty_id: Optional[int] = None,
+    sort: str = Query(
+        "created_at",
+        pattern=r"^-?(name|certificate|created_at)$",
+        description="Sort key: name, certificate or created_at; prefix with '-' for descending"
+    ),
+    search: Optional[str] = Query(None, min_length=1, max_length=100, description="Last name prefix (case-insensitive)"),
+    certificate_number: Optional[str] = Query(None, min_length=1, max_length=50, description="Exact certificate number"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created before"),
     skip: int = Query(0, ge=0, description="Number of records to skip (pagination)"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_operator)
 ):
     """
     Get list of students for operator's SPO.
-    Supports pagination with skip/limit parameters.
-    Optional filter by specialty_id.
+    Supports pagination with skip/limit parameters, server-side sorting
+    and filters by specialty, last name prefix, certificate number and creation date.
+    All parameters are part of the cache key.
     """
-    # Base query with JOINs — single query instead of N+1
+    # Scoped by the denormalized students.spo_id; JOINs only fetch names.
+    # Selects plain columns (Core rows) instead of ORM entities: no identity map
+    # or attribute instrumentation, payload dicts are built straight from rows.
     stmt = (
-        select(Student, Specialty.name.label("specialty_name"), SPO.name.label("spo_name"))
+        select(
+            Student.id,
+            Student.specialty_id,
+            Student.first_name,
+            Student.last_name,
+            Student.middle_name,
+            Student.certificate_number,
+            Student.created_at,
+            Specialty.name.label("specialty_name"),
+            SPO.name.label("spo_name")
+        )
         .join(Specialty, Student.specialty_id == Specialty.id)
-        .join(SPO, Specialty.spo_id == SPO.id)
-        .where(Specialty.spo_id == current_user.spo_id)
+        .join(SPO, Student.spo_id == SPO.id)
+        .where(Student.spo_id == current_user.spo_id)
     )
 
     if specialty_id is not None:
         # Verify specialty belongs to operator's SPO
         spec_result = await db.execute(
-            select(Specialty).where(
+            select(Specialty.id).where(
                 Specialty.id == specialty_id,
                 Specialty.spo_id == current_user.spo_id
             )
         )
-        if not spec_result.scalars().first():
+        if spec_result.scalar() is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Specialty not found or does not belong to your SPO"
             )
         stmt = stmt.where(Student.specialty_id == specialty_id)
 
+    if search is not None:
+        stmt = stmt.where(func.lower(Student.last_name).startswith(search.lower(), autoescape=True))
+    if certificate_number is not None:
+        stmt = stmt.where(Student.certificate_number == certificate_number)
+    if created_from is not None:
+        stmt = stmt.where(Student.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Student.created_at < created_to)
+
+    descending = sort.startswith("-")
+    sort_columns = STUDENT_SORT_COLUMNS[sort.lstrip("-")]
+    stmt = stmt.order_by(*(col.desc() if descending else col.asc() for col in sort_columns))
+
     stmt = stmt.offset(skip).limit(limit)
 
     result = await db.execute(stmt)
-    rows = result.all()
 
-    return [
-        StudentWithSpecialty(
-            id=student.id,
-            specialty_id=student.specialty_id,
-            first_name=student.first_name,
-            last_name=student.last_name,
-            middle_name=student.middle_name,
-            certificate_number=student.certificate_number,
-            created_at=student.created_at,
-            specialty_name=specialty_name,
-            spo_name=spo_name
+    # full_name is a computed field of StudentWithSpecialty; include it so the
+    # cached payload matches the validated response
+    students = []
+    for row in result.mappings():
+        student = dict(row)
+        student["full_name"] = " ".join(
+            part for part in (row["last_name"], row["first_name"], row["middle_name"]) if part
         )
-        for student, specialty_name, spo_name in rows
-    ]
+        students.append(student)
+    return students
 
 
 @router.post("/students", response_model=StudentResponse, status_code=status.HTTP_201_CREATED)
@@ -142,11 +186,11 @@ async def create_student(
     """
     # Lock the specialty row with FOR UPDATE to prevent race conditions (TOCTOU)
     result = await db.execute(
-        select(Specialty)
+        select(Specialty.spo_id, Specialty.quota)
         .where(Specialty.id == student_data.specialty_id, Specialty.spo_id == current_user.spo_id)
         .with_for_update()
     )
-    specialty = result.scalars().first()
+    specialty = result.first()
 
     if not specialty:
         raise HTTPException(
@@ -154,9 +198,11 @@ async def create_student(
             detail="Specialty not found or does not belong to your SPO"
         )
 
-    # Check quota availability (now safe from race conditions due to row lock)
+    # Check quota availability (now safe from race conditions due to row lock).
+    # Must be a separate statement: under READ COMMITTED it takes a fresh snapshot
+    # after the lock is granted, so it sees students committed by the previous holder.
     count_result = await db.execute(
-        select(func.count(Student.id)).where(Student.specialty_id == specialty.id)
+        select(func.count(Student.id)).where(Student.specialty_id == student_data.specialty_id)
     )
     students_count = count_result.scalar()
 
@@ -166,28 +212,28 @@ async def create_student(
             detail=f"Quota exceeded. Current: {students_count}, Quota: {specialty.quota}"
         )
 
-    # Check global uniqueness of certificate_number
-    existing_result = await db.execute(
-        select(Student).where(Student.certificate_number == student_data.certificate_number)
-    )
-    existing_student = existing_result.scalars().first()
-
-    if existing_student:
+    # Global uniqueness of certificate_number is enforced by its unique index
+    try:
+        result = await db.execute(
+            insert(Student)
+            .values(
+                specialty_id=student_data.specialty_id,
+                spo_id=specialty.spo_id,
+                first_name=student_data.first_name,
+                last_name=student_data.last_name,
+                middle_name=student_data.middle_name,
+                certificate_number=student_data.certificate_number
+            )
+            .returning(Student)
+        )
+        student = result.scalars().one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Студент с таким номером аттестата уже зарегистрирован в системе"
         )
-
-    student = Student(
-        specialty_id=student_data.specialty_id,
-        first_name=student_data.first_name,
-        last_name=student_data.last_name,
-        middle_name=student_data.middle_name,
-        certificate_number=student_data.certificate_number
-    )
-    db.add(student)
-    await db.commit()
-    await db.refresh(student)
     await invalidate("op:students", "op:specialties", "stats", "admin:spo")
     return student
 
@@ -204,33 +250,27 @@ async def update_student(
     - If changing specialty, new specialty must belong to operator's SPO
     - If changing certificate_number, must remain globally unique
     """
-    # Get all specialties of operator's SPO
-    spo_specialty_ids = select(Specialty.id).where(Specialty.spo_id == current_user.spo_id)
-
-    result = await db.execute(
-        select(Student).where(
-            Student.id == student_id,
-            Student.specialty_id.in_(spo_specialty_ids)
-        )
-    )
-    student = result.scalars().first()
-
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found or does not belong to your SPO"
-        )
-
     update_data = student_data.model_dump(exclude_unset=True)
 
+    scope = (Student.id == student_id, Student.spo_id == current_user.spo_id)
+
     # If changing specialty, verify it belongs to operator's SPO and has quota
-    if 'specialty_id' in update_data and update_data['specialty_id'] != student.specialty_id:
+    if 'specialty_id' in update_data:
+        # The student must exist in this SPO before any specialty is locked or counted
+        current_result = await db.execute(select(Student.specialty_id).where(*scope))
+        current_specialty_id = current_result.scalar()
+        if current_specialty_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Student not found or does not belong to your SPO"
+            )
+
         new_spec_result = await db.execute(
-            select(Specialty)
+            select(Specialty.spo_id, Specialty.quota)
             .where(Specialty.id == update_data['specialty_id'], Specialty.spo_id == current_user.spo_id)
             .with_for_update()
         )
-        new_specialty = new_spec_result.scalars().first()
+        new_specialty = new_spec_result.first()
 
         if not new_specialty:
             raise HTTPException(
@@ -238,39 +278,49 @@ async def update_student(
                 detail="Specialty not found or does not belong to your SPO"
             )
 
-        count_result = await db.execute(
-            select(func.count(Student.id)).where(Student.specialty_id == new_specialty.id)
-        )
-        students_count = count_result.scalar()
-
-        if students_count >= new_specialty.quota:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Quota exceeded. Current: {students_count}, Quota: {new_specialty.quota}"
-            )
-
-    # If changing certificate_number, check global uniqueness
-    if 'certificate_number' in update_data and update_data['certificate_number'] != student.certificate_number:
-        existing_result = await db.execute(
-            select(Student).where(
-                Student.certificate_number == update_data['certificate_number'],
-                Student.id != student_id
+        # Staying in the same specialty takes no extra place
+        if current_specialty_id != update_data['specialty_id']:
+            count_result = await db.execute(
+                select(func.count(Student.id)).where(Student.specialty_id == update_data['specialty_id'])
             )
+            students_count = count_result.scalar()
+
+            if students_count >= new_specialty.quota:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Quota exceeded. Current: {students_count}, Quota: {new_specialty.quota}"
+                )
+
+        # Keep denormalized spo_id consistent with the new specialty
+        update_data['spo_id'] = new_specialty.spo_id
+
+    if update_data:
+        # Global uniqueness of certificate_number is enforced by its unique index
+        stmt = update(Student).where(*scope).values(**update_data).returning(Student)
+    else:
+        stmt = select(Student).where(*scope)
+
+    try:
+        result = await db.execute(stmt)
+        student = result.scalars().first()
+    except IntegrityError:
+        await db.rollback()
+        if 'certificate_number' not in update_data:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Студент с таким номером аттестата уже зарегистрирован в системе"
         )
-        existing = existing_result.scalars().first()
-
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Студент с таким номером аттестата уже зарегистрирован в системе"
-            )
 
-    for key, value in update_data.items():
-        setattr(student, key, value)
+    if not student:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student not found or does not belong to your SPO"
+        )
 
     await db.commit()
-    await db.refresh(student)
-    await invalidate("op:students", "op:specialties", "stats", "admin:spo")
+    if update_data:
+        await invalidate("op:students", "op:specialties", "stats", "admin:spo")
     return student
 
 
@@ -283,13 +333,10 @@ async def delete_student(
     """
     Delete student by ID (only from operator's SPO).
     """
-    # Get all specialties of operator's SPO
-    spo_specialty_ids = select(Specialty.id).where(Specialty.spo_id == current_user.spo_id)
-
     result = await db.execute(
         select(Student).where(
             Student.id == student_id,
-            Student.specialty_id.in_(spo_specialty_ids)
+            Student.spo_id == current_user.spo_id
         )
     )
     student = result.scalars().first()
@@ -303,3 +350,98 @@ async def delete_student(
     await db.delete(student)
     await db.commit()
     await invalidate("op:students", "op:specialties", "stats", "admin:spo")
+
+
+@router.post("/students/batch", response_model=StudentBatchResponse)
+async def batch_students(
+    batch_data: StudentBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_operator)
+):
+    """
+    Move and/or delete several students of operator's SPO in one transaction.
+    - Target specialties are locked once, in id order, before the students rows
+    - Quotas of all target specialties are validated with one aggregate query
+    - Either every change is applied or none is
+    """
+    # Lock target specialties first and in a deterministic order (same order as
+    # create_student/update_student: specialty, then student) to avoid deadlocks
+    target_ids = sorted({move.specialty_id for move in batch_data.moves})
+    quotas: dict[int, int] = {}
+    if target_ids:
+        spec_result = await db.execute(
+            select(Specialty.id, Specialty.quota)
+            .where(Specialty.id.in_(target_ids), Specialty.spo_id == current_user.spo_id)
+            .order_by(Specialty.id)
+            .with_for_update()
+        )
+        quotas = dict(spec_result.all())
+        if len(quotas) != len(target_ids):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Specialty not found or does not belong to your SPO"
+            )
+
+    student_ids = [move.student_id for move in batch_data.moves] + batch_data.delete_ids
+    result = await db.execute(
+        select(Student.id, Student.specialty_id)
+        .where(Student.id.in_(student_ids), Student.spo_id == current_user.spo_id)
+        .order_by(Student.id)
+        .with_for_update()
+    )
+    current_specialty = dict(result.all())
+    if len(current_specialty) != len(student_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student not found or does not belong to your SPO"
+        )
+
+    # Moves into the specialty the student is already in are no-ops
+    moves = {
+        move.student_id: move.specialty_id
+        for move in batch_data.moves
+        if move.specialty_id != current_specialty[move.student_id]
+    }
+
+    if moves:
+        # Net change per target specialty: incoming moves minus students leaving it
+        delta = Counter(moves.values())
+        for student_id in list(moves) + batch_data.delete_ids:
+            source_id = current_specialty[student_id]
+            if source_id in quotas:
+                delta[source_id] -= 1
+
+        count_result = await db.execute(
+            select(Student.specialty_id, func.count(Student.id))
+            .where(Student.specialty_id.in_(target_ids))
+            .group_by(Student.specialty_id)
+        )
+        counts = dict(count_result.all())
+
+        for specialty_id in target_ids:
+            students_count = counts.get(specialty_id, 0)
+            if delta[specialty_id] > 0 and students_count + delta[specialty_id] > quotas[specialty_id]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=(
+                        f"Quota exceeded for specialty {specialty_id}. "
+                        f"Current: {students_count}, Quota: {quotas[specialty_id]}"
+                    )
+                )
+
+        students_by_target: dict[int, list[int]] = defaultdict(list)
+        for student_id, specialty_id in moves.items():
+            students_by_target[specialty_id].append(student_id)
+        for specialty_id, ids in students_by_target.items():
+            await db.execute(
+                update(Student)
+                .where(Student.id.in_(ids))
+                .values(specialty_id=specialty_id, spo_id=current_user.spo_id)
+            )
+
+    if batch_data.delete_ids:
+        await db.execute(delete(Student).where(Student.id.in_(batch_data.delete_ids)))
+
+    await db.commit()
+    await invalidate("op:students", "op:specialties", "stats", "admin:spo")
+    return StudentBatchResponse(moved=len(moves), deleted=len(batch_data.delete_ids))
@@ -7,7 +7,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_read_db, get_current_user
 from app.models import User, UserRole, SPO, Specialty, Student
 from app.schemas import SpecialtyStats, SPOStats, OverallStats
 from app.core.cache import cached, invalidate
@@ -19,7 +19,7 @@ router = APIRouter(prefix="/api", tags=["Statistics"])
 @router.get("/stats", response_model=OverallStats)
 @cached("stats", ttl=300)
 async def get_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -31,6 +31,7 @@ async def get_stats(
     """
     # Build base SPO filter
     spo_filter = SPO.id == current_user.spo_id if current_user.role != UserRole.ADMIN else True
+    student_filter = Student.spo_id == current_user.spo_id if current_user.role != UserRole.ADMIN else True
 
     # Subquery: count students per specialty
     students_per_specialty = (
@@ -38,6 +39,7 @@ async def get_stats(
             Student.specialty_id,
             func.count(Student.id).label("students_count")
         )
+        .where(student_filter)
         .group_by(Student.specialty_id)
         .subquery()
     )
@@ -4,6 +4,9 @@ from app.core.database import Base, engine, AsyncSessionLocal
 from app.core.security import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    PasswordHashingOverloaded,
     create_access_token,
     decode_access_token
 )
@@ -4,17 +4,23 @@ Async Redis cache layer with decorator and invalidation.
 import json
 import functools
 import logging
-from typing import Optional
+import time
+from datetime import date, datetime
+from typing import Any, Optional
 
 import redis.asyncio as aioredis
 from fastapi.responses import JSONResponse
 
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
 
 logger = logging.getLogger(__name__)
 
 _redis: Optional[aioredis.Redis] = None
 
+# Marks recently invalidated prefixes (only used with a read replica)
+_INVALIDATED_KEY_PREFIX = "invalidated:"
+
 
 async def init_cache() -> None:
     """Initialize Redis connection."""
@@ -24,7 +30,7 @@ async def init_cache() -> None:
         await _redis.ping()
         logger.info("Redis connected")
     except Exception as e:
-        logger.warning(f"Redis unavailable, caching disabled: {e}")
+        logger.warning("Redis unavailable, caching disabled: %s", e)
         _redis = None
 
 
@@ -37,6 +43,13 @@ async def close_cache() -> None:
         logger.info("Redis connection closed")
 
 
+def _json_default(value: Any) -> Any:
+    """Serialize values that plain dict payloads may carry (same format as Pydantic)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 def get_redis() -> Optional[aioredis.Redis]:
     """Get current Redis client (or None if unavailable)."""
     return _redis
@@ -82,13 +95,19 @@ def cached(prefix: str, ttl: int = 300):
             try:
                 cached_data = await r.get(cache_key)
                 if cached_data is not None:
+                    CACHE_REQUESTS.labels(prefix, "hit").inc()
                     return JSONResponse(content=json.loads(cached_data))
+                CACHE_REQUESTS.labels(prefix, "miss").inc()
             except Exception as e:
-                logger.warning(f"Cache read error: {e}")
+                logger.warning("Cache read error: %s", e)
 
             result = await func(*args, **kwargs)
 
             try:
+                # With a read replica, a result computed right after an invalidation may
+                # predate the write (replication lag): serve it, but don't cache it
+                if settings.DATABASE_REPLICA_URL and await r.exists(f"{_INVALIDATED_KEY_PREFIX}{prefix}"):
+                    return result
                 if isinstance(result, list):
                     payload = [
                         item.model_dump(mode="json") if hasattr(item, "model_dump") else item
@@ -98,9 +117,9 @@ def cached(prefix: str, ttl: int = 300):
                     payload = result.model_dump(mode="json")
                 else:
                     payload = result
-                await r.set(cache_key, json.dumps(payload), ex=ttl)
+                await r.set(cache_key, json.dumps(payload, default=_json_default), ex=ttl)
             except Exception as e:
-                logger.warning(f"Cache write error: {e}")
+                logger.warning("Cache write error: %s", e)
 
             return result
         return wrapper
@@ -120,6 +139,9 @@ async def invalidate(*patterns: str) -> None:
 
     for pattern in patterns:
         try:
+            if settings.DATABASE_REPLICA_URL:
+                # Suppress re-caching from a lagging replica (see cached)
+                await r.set(f"{_INVALIDATED_KEY_PREFIX}{pattern}", 1, ex=settings.REPLICA_STICKY_SECONDS)
             cursor = 0
             while True:
                 cursor, keys = await r.scan(cursor, match=f"{pattern}*", count=100)
@@ -128,4 +150,82 @@ async def invalidate(*patterns: str) -> None:
                 if cursor == 0:
                     break
         except Exception as e:
-            logger.warning(f"Cache invalidation error for '{pattern}': {e}")
+            logger.warning("Cache invalidation error for '%s': %s", pattern, e)
+
+
+# ==================== Principal cache ====================
+#
+# Authenticated principals (id, login, role, spo_id, created_at) keyed by user id,
+# so get_current_user can skip the users lookup. Two levels: a small in-process
+# dict with a very short TTL (other workers may keep a stale entry at most that
+# long after an invalidation) and Redis with a longer TTL shared by all workers.
+
+_PRINCIPAL_KEY_PREFIX = "principal:"
+_LOCAL_PRINCIPALS_MAX_SIZE = 10_000
+_local_principals: dict[int, tuple[float, dict]] = {}
+
+
+def _remember_principal_locally(user_id: int, principal: dict, now: float) -> None:
+    if len(_local_principals) >= _LOCAL_PRINCIPALS_MAX_SIZE:
+        # Dicts keep insertion order: drop the oldest entry
+        del _local_principals[next(iter(_local_principals))]
+    _local_principals[user_id] = (now + settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS, principal)
+
+
+async def get_cached_principal(user_id: int) -> Optional[dict]:
+    """Return the cached principal for a user id, or None on miss."""
+    now = time.monotonic()
+    entry = _local_principals.get(user_id)
+    if entry is not None:
+        expires_at, principal = entry
+        if expires_at > now:
+            return principal
+        del _local_principals[user_id]
+
+    r = _redis
+    if r is None:
+        return None
+    try:
+        raw = await r.get(f"{_PRINCIPAL_KEY_PREFIX}{user_id}")
+    except Exception as e:
+        logger.warning("Principal cache read error: %s", e)
+        return None
+    if raw is None:
+        return None
+
+    principal = json.loads(raw)
+    _remember_principal_locally(user_id, principal, now)
+    return principal
+
+
+async def cache_principal(user_id: int, principal: dict) -> None:
+    """Store a principal in the in-process and Redis caches."""
+    _remember_principal_locally(user_id, principal, time.monotonic())
+
+    r = _redis
+    if r is None:
+        return
+    try:
+        await r.set(
+            f"{_PRINCIPAL_KEY_PREFIX}{user_id}",
+            json.dumps(principal, default=_json_default),
+            ex=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning("Principal cache write error: %s", e)
+
+
+async def invalidate_principals(*user_ids: int) -> None:
+    """Drop cached principals after a user was deleted or its credentials changed."""
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        _local_principals.pop(user_id, None)
+
+    r = _redis
+    if r is None:
+        return
+    try:
+        await r.delete(*(f"{_PRINCIPAL_KEY_PREFIX}{user_id}" for user_id in user_ids))
+    except Exception as e:
+        logger.warning("Principal cache invalidation error: %s", e)
@@ -1,29 +1,299 @@
 """
 Database connection and session management (async).
 """
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase
+import asyncio
+import logging
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
 
+from sqlalchemy import event, exc, inspect, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.core.cache import get_redis
 from app.core.config import settings
+from app.core import sql_instrumentation  # noqa: F401  (registers SQL event hooks)
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Default async queue pool that also records checkout wait time and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def engine_options(url: str) -> tuple[URL, dict]:
+    """
+    Engine URL and keyword arguments from the DB_* settings.
+
+    DB_POOL_SIZE=0 disables pooling (NullPool). DB_PGBOUNCER=true disables the
+    asyncpg prepared statement caches and uses unique statement names, as
+    required behind PgBouncer in transaction/statement pooling mode.
+    """
+    url = make_url(url)
+    options: dict = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if settings.DB_POOL_SIZE > 0:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    else:
+        options["poolclass"] = NullPool
+
+    if url.get_driver_name() == "asyncpg":
+        connect_args = {
+            "timeout": settings.DB_CONNECT_TIMEOUT,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT or None,
+        }
+        if settings.DB_PGBOUNCER:
+            url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+            )
+        else:
+            url = url.update_query_dict(
+                {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+            )
+            connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        options["connect_args"] = connect_args
+    return url, options
+
+
+def create_engine_from_settings(url: str) -> AsyncEngine:
+    """Create an async engine configured from the DB_* settings."""
+    url, options = engine_options(url)
+    return create_async_engine(url, **options)
 
 
 # Create async SQLAlchemy engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+engine = create_engine_from_settings(settings.DATABASE_URL)
 
 # Async session factory
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+# Optional read replica for read-only endpoints (see get_read_db in app.api.deps)
+replica_engine: Optional[AsyncEngine] = None
+ReplicaSessionLocal: Optional[async_sessionmaker] = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine_from_settings(settings.DATABASE_REPLICA_URL)
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, expire_on_commit=False)
+
+
+def pool_stats(bind: AsyncEngine) -> dict:
+    """Connection pool utilization and checkout wait statistics for one engine."""
+    pool = bind.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pooled": False}
+    # InstrumentedQueuePool is only built by engine_options, from DB_MAX_OVERFLOW
+    max_overflow = settings.DB_MAX_OVERFLOW
+    capacity = pool.size() + max(max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "pooled": True,
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilization": round(checked_out / capacity, 3) if capacity else 0.0,
+        "checkouts": pool.checkouts,
+        "timeouts": pool.timeouts,
+        "wait_seconds_avg": pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+        "wait_seconds_max": pool.wait_seconds_max,
+    }
+
+
+def get_pool_stats() -> dict:
+    """Pool statistics of the primary (and replica, if configured) engine in this worker."""
+    stats = {"primary": pool_stats(engine)}
+    if replica_engine is not None:
+        stats["replica"] = pool_stats(replica_engine)
+    return stats
+
+
+# ---- Read-your-writes stickiness ----
+#
+# After a user's own write is committed, their reads go to the primary for
+# REPLICA_STICKY_SECONDS so replication lag never hides the change from them.
+# Marks live in Redis (shared by workers) and in process memory.
+
+_STICKY_KEY_PREFIX = "sticky:"
+_LOCAL_STICKY_MAX_SIZE = 10_000
+_local_sticky: dict[int, float] = {}
+_pending_tasks: set = set()
+
+
+async def _store_sticky_mark(user_id: int) -> None:
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        await r.set(f"{_STICKY_KEY_PREFIX}{user_id}", 1, ex=settings.REPLICA_STICKY_SECONDS)
+    except Exception as e:
+        logger.warning("Sticky mark write error: %s", e)
+
+
+def mark_primary_sticky(user_id: int) -> None:
+    """Route this user's reads to the primary for the next REPLICA_STICKY_SECONDS."""
+    now = time.monotonic()
+    if len(_local_sticky) >= _LOCAL_STICKY_MAX_SIZE:
+        for stale in [uid for uid, expires_at in _local_sticky.items() if expires_at <= now]:
+            del _local_sticky[stale]
+    _local_sticky[user_id] = now + settings.REPLICA_STICKY_SECONDS
+
+    if ReplicaSessionLocal is not None:
+        # Called from a sync session event: publish to Redis in the background
+        task = asyncio.get_running_loop().create_task(_store_sticky_mark(user_id))
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
+
+
+async def is_primary_sticky(user_id: int) -> bool:
+    """True if the user wrote recently and must read from the primary."""
+    expires_at = _local_sticky.get(user_id)
+    if expires_at is not None and expires_at > time.monotonic():
+        return True
+
+    r = get_redis()
+    if r is None:
+        return False
+    try:
+        return bool(await r.exists(f"{_STICKY_KEY_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.warning("Sticky mark read error, using primary: %s", e)
+        return True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_writer_sticky(session) -> None:
+    # user_id is put into session.info by get_current_user
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        mark_primary_sticky(session.info["user_id"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session) -> None:
+    session.info.pop("wrote", None)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+_MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "alembic" / "versions"
+_REVISION_RE = re.compile(r"^revision(?:\s*:[^=]*)?\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision(?:\s*:[^=]*)?\s*=\s*(?:['\"]([^'\"]+)['\"]|None)", re.MULTILINE)
+
+
+def get_alembic_head() -> str:
+    """
+    Head revision of the migration scripts shipped with the application.
+    Read straight from the files: the alembic/ package in this directory shadows
+    the alembic library inside the app, and parsing is cheaper than importing anyway.
+    """
+    revisions, parents = set(), set()
+    for path in _MIGRATIONS_DIR.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION_RE.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION_RE.search(source)
+        if down_revision is not None and down_revision.group(1):
+            parents.add(down_revision.group(1))
+
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected a single Alembic head, found: {sorted(heads)}")
+    return heads.pop()
+
+
+# Schemas created by create_all before migrations ran at deploy time match this
+# revision; the later migrations still have to be applied on top of it
+# (alembic/env.py stamps such databases with it before upgrading)
+PRE_MIGRATIONS_REVISION = "004"
+
+
+async def _current_revision(bind: AsyncEngine) -> tuple[Optional[str], bool]:
+    """(revision in alembic_version, whether the application tables exist)."""
+    async with bind.connect() as conn:
+        try:
+            return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar(), True
+        except DBAPIError:
+            # No alembic_version table: database was never migrated
+            await conn.rollback()
+            populated = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
+            return None, populated
+
+
+async def check_schema_revision(bind: Optional[AsyncEngine] = None) -> None:
+    """Fail fast unless the database is migrated to the Alembic head (run `alembic upgrade head`)."""
+    (current, populated), head = await asyncio.gather(
+        _current_revision(bind or engine),
+        asyncio.to_thread(get_alembic_head),
+    )
+    if current is None and populated:
+        raise RuntimeError(
+            "Database schema was created without Alembic (no alembic_version table): run "
+            f"'alembic upgrade head', which stamps it as revision {PRE_MIGRATIONS_REVISION} first"
+        )
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}: run 'alembic upgrade head'"
+        )
+
+
 async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """
+    Prepare the database schema according to DB_STARTUP_SCHEMA:
+    "check" (verify the Alembic revision), "create_all" (create missing tables,
+    for throwaway databases) or "skip".
+    """
+    mode = settings.DB_STARTUP_SCHEMA
+    if mode == "check":
+        await check_schema_revision()
+    elif mode == "create_all":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    elif mode != "skip":
+        raise ValueError(f"Unsupported DB_STARTUP_SCHEMA: {mode}")
@@ -0,0 +1,131 @@
+"""
+Logging: JSON lines written by a background thread.
+
+Handlers never run on the event loop. Records are put on a queue by a
+QueueHandler and a QueueListener thread formats and writes them (stdout, and
+the slow query log file when configured). Request-scoped fields (request_id,
+user_id, role, method, route) are read from the request context when the
+record is created, because the context is not visible from the writer thread.
+
+Log with %-style arguments (logger.info("... %s", value)): the message is only
+built for records that pass the level check.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.request_context import get_request_context
+
+_CONTEXT_FIELDS = ("request_id", "user_id", "role", "method", "route")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; the message and traceback are properly escaped."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in _CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the fields of the current request to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = get_request_context()
+        if context is not None:
+            record.request_id = context.request_id
+            record.user_id = context.user_id
+            record.role = context.role
+            record.method = context.method
+            record.route = context.route
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Render the message in the calling thread (arguments may change later) but
+    keep the traceback separate, so the JSON formatter can put it in its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _slow_query_file_handler() -> Optional[logging.Handler]:
+    """Slow queries also go to SQL_SLOW_QUERY_LOG_FILE when configured."""
+    if not settings.SQL_SLOW_QUERY_LOG_FILE:
+        return None
+    handler = logging.FileHandler(settings.SQL_SLOW_QUERY_LOG_FILE, encoding="utf-8")
+    handler.addFilter(logging.Filter("app.sql.slow"))
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def configure_logging() -> None:
+    """Route all logging through the queue (idempotent; called when the app module loads)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(JsonFormatter())
+    handlers = [console]
+    slow_query_handler = _slow_query_file_handler()
+    if slow_query_handler is not None:
+        handlers.append(slow_query_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    # uvicorn installs its own synchronous stream handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,107 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A heartbeat task on the event loop wakes up every few milliseconds and records
+how late it was (event_loop_lag_seconds). A watchdog thread checks the
+heartbeat: when the loop has not run it for LOOP_BLOCK_THRESHOLD_MS, something
+is blocking it (CPU-bound code, synchronous I/O), and the watchdog captures the
+loop thread's current stack. When the loop recovers, the stall is logged once
+with its duration and that stack, and event_loop_blocked_total is incremented.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Heartbeat on the running loop plus a watchdog thread (see module docstring)."""
+
+    def __init__(self, threshold_seconds: float):
+        self.threshold = threshold_seconds
+        # Heartbeat often enough that normal scheduling jitter stays far below the threshold
+        self.interval = min(threshold_seconds / 4, 0.05)
+        self._last_beat = time.monotonic()
+        self._blocked_stack: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start on the running loop (call from the loop thread)."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(now - expected, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        stack, self._blocked_stack = self._blocked_stack, None
+        EVENT_LOOP_BLOCKS.inc()
+        logger.warning(
+            "Event loop blocked for %.0f ms (threshold %.0f ms). Blocking call:\n%s",
+            lag * 1000,
+            self.threshold * 1000,
+            stack or "  stack not captured (stall ended before the watchdog checked)",
+        )
+
+    def _watchdog(self) -> None:
+        while not self._stopped.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled < self.threshold or self._blocked_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_stack = "".join(traceback.format_stack(frame))
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor() -> None:
+    """Start monitoring this worker's event loop (application startup)."""
+    global _monitor
+    if settings.LOOP_MONITOR_ENABLED and settings.LOOP_BLOCK_THRESHOLD_MS > 0 and _monitor is None:
+        _monitor = LoopMonitor(settings.LOOP_BLOCK_THRESHOLD_MS / 1000)
+        _monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
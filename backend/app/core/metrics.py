@@ -0,0 +1,158 @@
+"""
+Prometheus metrics: HTTP requests, DB pool, cache, password hashing, event loop.
+
+Multi-process: with several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an
+empty directory (cleared before the workers start). Every worker then writes its
+samples there and /metrics aggregates all workers, whichever one serves the
+scrape. Without it each worker reports only its own numbers.
+
+Per-process values that are not events (pool state, hashing queue length) are
+sampled every METRICS_SAMPLE_INTERVAL_SECONDS by a background task. Password
+hashing latency, queue wait and rejections are recorded by
+app.core.security._run_hashing; event-loop lag and stalls by
+app.core.loop_monitor.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ---- HTTP ----
+# Labelled by route template (/api/admin/spo/{spo_id}), never by raw path
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter("http_requests_total", "HTTP requests by status code", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled", multiprocess_mode="livesum"
+)
+
+# ---- Cache ----
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Response cache lookups", ["prefix", "result"])
+
+# ---- Password hashing ----
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent in a password hashing call (bcrypt/argon2)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PASSWORD_HASH_QUEUE_SECONDS = Histogram(
+    "password_hash_queue_seconds",
+    "Time a password hashing call waited for a free hashing thread",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected", "Password hashing calls rejected because the queue was full"
+)
+
+# ---- Sampled per worker ----
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database connections by state",
+    ["engine", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts", "Connection checkouts that timed out", ["engine"]
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "Password hashing calls running or queued",
+    multiprocess_mode="livesum",
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of a scheduled wake-up on the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocked_total", "Event-loop stalls longer than LOOP_BLOCK_THRESHOLD_MS"
+)
+
+
+def render_metrics() -> bytes:
+    """Exposition text for /metrics (aggregated over workers in multi-process mode)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# Pool timeout totals already added to the counter, per engine
+_reported_checkout_timeouts: dict[str, int] = {}
+
+
+def sample_runtime_metrics() -> None:
+    """Copy pool and hashing state of this worker into the gauges (new checkout timeouts into their counter)."""
+    # Imported here: app.core.database imports the cache and app.core.security
+    # records into this module, so both import it
+    from app.core.database import get_pool_stats
+    from app.core.security import get_hashing_stats
+
+    for engine_name, stats in get_pool_stats().items():
+        if not stats["pooled"]:
+            continue
+        for state in ("checked_out", "idle", "overflow"):
+            DB_POOL_CONNECTIONS.labels(engine_name, state).set(stats[state])
+        new_timeouts = stats["timeouts"] - _reported_checkout_timeouts.get(engine_name, 0)
+        if new_timeouts > 0:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(engine_name).inc(new_timeouts)
+        _reported_checkout_timeouts[engine_name] = stats["timeouts"]
+
+    PASSWORD_HASH_IN_FLIGHT.set(get_hashing_stats()["in_flight"])
+
+
+async def _run_sampler(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            sample_runtime_metrics()
+        except Exception as e:
+            logger.warning("Metrics sampling failed: %s", e)
+
+
+_sampler_task: Optional[asyncio.Task] = None
+
+
+def start_metrics_sampler() -> None:
+    """Start the background sampler of this worker (application startup)."""
+    global _sampler_task
+    if settings.METRICS_ENABLED and settings.METRICS_SAMPLE_INTERVAL_SECONDS > 0 and _sampler_task is None:
+        _sampler_task = asyncio.create_task(_run_sampler(settings.METRICS_SAMPLE_INTERVAL_SECONDS))
+
+
+async def stop_metrics_sampler() -> None:
+    """Stop the sampler and retire this worker's live gauges (application shutdown)."""
+    global _sampler_task
+    if _sampler_task is not None:
+        _sampler_task.cancel()
+        try:
+            await _sampler_task
+        except asyncio.CancelledError:
+            pass
+        _sampler_task = None
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
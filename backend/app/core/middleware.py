@@ -0,0 +1,411 @@
+"""
+ASGI middleware: request IDs, response compression, per-user/per-route rate
+limiting and load shedding, per-request SQL statistics, Prometheus request
+metrics.
+
+All of them are plain ASGI callables (no BaseHTTPMiddleware / @app.middleware):
+no extra task or response stream wrapping per request, and streaming responses
+such as the DOCX download pass through unchanged.
+"""
+import logging
+import re
+import time
+import uuid
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import REQUEST_LATENCY, REQUESTS, REQUESTS_IN_PROGRESS
+from app.core.rate_limit import TokenBucketLimiter, retry_after_header
+from app.core.request_context import RequestContext, set_request_context, reset_request_context
+from app.core.security import decode_access_token
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+# Client-supplied request IDs end up in logs and storage keys: accept only short, plain ones
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+class RequestIdMiddleware:
+    """
+    Take the X-Request-ID header (or generate one), store it in the request
+    state (request.state.request_id) and echo it on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_RE.fullmatch(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
+
+
+# Health checks are never limited (nor are CORS preflights, see __call__)
+_EXEMPT_PATHS = frozenset({"/", "/health", "/metrics"})
+
+
+def _client_identity(scope) -> str:
+    """Rate limit key: user id from a valid bearer token, otherwise client IP."""
+    headers = dict(scope.get("headers") or ())
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_access_token(token)
+        if payload and payload.get("sub") is not None:
+            return f"user:{payload['sub']}"
+
+    forwarded_for = headers.get(b"x-forwarded-for", b"").decode("latin-1")
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    Token-bucket limits per user (per IP when anonymous), stricter buckets for
+    expensive routes, and a per-worker cap on concurrently processed requests.
+
+    Rejections are answered before any dependency runs (no DB session, no
+    connection checkout): 429 when a bucket is empty, 503 when the worker is
+    saturated, both with Retry-After.
+
+    Route rules map "METHOD /path-prefix" to (per_second, burst).
+    """
+
+    def __init__(
+        self,
+        app,
+        per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        routes: Optional[dict] = None,
+        max_concurrent: Optional[int] = None,
+    ):
+        self.app = app
+        self.user_limiter = TokenBucketLimiter(
+            "user",
+            settings.RATE_LIMIT_PER_SECOND if per_second is None else per_second,
+            settings.RATE_LIMIT_BURST if burst is None else burst,
+        )
+        self.route_limiters = []
+        for rule, (rule_per_second, rule_burst) in (settings.RATE_LIMIT_ROUTES if routes is None else routes).items():
+            method, _, prefix = rule.partition(" ")
+            self.route_limiters.append((
+                method.upper(),
+                prefix,
+                TokenBucketLimiter(f"route:{method.upper()}:{prefix}", rule_per_second, int(rule_burst)),
+            ))
+        self.max_concurrent = settings.MAX_CONCURRENT_REQUESTS if max_concurrent is None else max_concurrent
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in _EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            logger.warning("Shedding %s %s: %d requests in flight", scope["method"], scope["path"], self.in_flight)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry later"},
+                headers=retry_after_header(1),
+            )
+            await response(scope, receive, send)
+            return
+
+        identity = _client_identity(scope)
+        retry_after = await self.user_limiter.hit(identity)
+        if retry_after is None:
+            for method, prefix, limiter in self.route_limiters:
+                if scope["method"] == method and scope["path"].startswith(prefix):
+                    retry_after = await limiter.hit(identity)
+                    if retry_after is not None:
+                        break
+        if retry_after is not None:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."},
+                headers=retry_after_header(retry_after),
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+class RequestStatsMiddleware:
+    """
+    Collect SQL statistics per request (see app.core.sql_instrumentation).
+
+    - Server-Timing header with DB time and query count (non-production only)
+    - warning when a request runs more than SQL_QUERY_BUDGET statements
+    - warning when one statement repeats SQL_REPEATED_QUERY_THRESHOLD times (likely N+1)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Request ID is assigned by the outer RequestIdMiddleware
+        request_id = (scope.get("state") or {}).get("request_id") or str(uuid.uuid4())
+        context = RequestContext(request_id=request_id, method=scope["method"], path=scope["path"], scope=scope)
+        token = set_request_context(context)
+        started = time.perf_counter()
+        server_timing = settings.ENVIRONMENT.lower() != "production"
+
+        async def send_with_timing(message):
+            if server_timing and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={context.db_seconds * 1000:.1f};desc="{context.query_count} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            reset_request_context(token)
+            self._report(context, context.route)
+
+    @staticmethod
+    def _report(context: RequestContext, route_path: str) -> None:
+        if settings.SQL_QUERY_BUDGET and context.query_count > settings.SQL_QUERY_BUDGET:
+            logger.warning(
+                "Query budget exceeded: %d queries (budget %d, %.1f ms) for %s %s request_id=%s",
+                context.query_count, settings.SQL_QUERY_BUDGET, context.db_seconds * 1000,
+                context.method, route_path, context.request_id,
+            )
+        if settings.SQL_REPEATED_QUERY_THRESHOLD and context.statement_counts:
+            statement, count = context.statement_counts.most_common(1)[0]
+            if count >= settings.SQL_REPEATED_QUERY_THRESHOLD:
+                logger.warning(
+                    "Possible N+1: statement executed %d times for %s %s request_id=%s: %s",
+                    count, context.method, route_path, context.request_id, statement,
+                )
+
+
+class MetricsMiddleware:
+    """
+    Prometheus request metrics: latency histogram and status counter per route
+    template, requests in progress. Requests that match no route are counted
+    under "unmatched" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path).observe(time.perf_counter() - started)
+            REQUESTS.labels(scope["method"], route_path, str(status_code)).inc()
+
+
+# Worth compressing; binary formats (DOCX is a zip archive, images) are left alone
+_COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+})
+
+
+def _accepted_encodings(scope) -> set[str]:
+    """Codings the client accepts ("gzip;q=0" opts out)."""
+    accepted = set()
+    for item in Headers(scope=scope).get("accept-encoding", "").split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def _is_compressible(content_type: str) -> bool:
+    mime = content_type.split(";")[0].strip().lower()
+    if mime.startswith("text/"):
+        return mime != "text/event-stream"
+    return mime in _COMPRESSIBLE_TYPES
+
+
+class _GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress and flush, so each streamed chunk reaches the client right away."""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress text and JSON responses with brotli (when the brotli package is
+    installed and the client accepts it) or gzip.
+
+    Left as is: bodies smaller than minimum_size, responses that already carry
+    a Content-Encoding, and non-text content types such as the DOCX export.
+    Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+    ):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.gzip_level = settings.COMPRESSION_GZIP_LEVEL if gzip_level is None else gzip_level
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+
+    def _compressor(self, scope):
+        accepted = _accepted_encodings(scope)
+        if brotli is not None and "br" in accepted:
+            return _BrotliCompressor(self.brotli_quality)
+        if "gzip" in accepted:
+            return _GzipCompressor(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        compressor = self._compressor(scope)
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        # None: undecided (waiting for the first body chunk), then True / False
+        compressing: Optional[bool] = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressing
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or not _is_compressible(headers.get("content-type", "")):
+                    compressing = False
+                    await send(message)
+                else:
+                    start_message = message  # held until the size of the body is known
+                return
+            if message_type != "http.response.body" or compressing is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressing is None:
+                headers = MutableHeaders(scope=start_message)
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    compressing = False
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressing = True
+                headers["Content-Encoding"] = compressor.encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
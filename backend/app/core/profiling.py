@@ -0,0 +1,179 @@
+"""
+On-demand request profiling for admins.
+
+Send a request with the header "X-Profile: 1" (or the query parameter
+"profile=1") and an admin token. The request is then run under a sampling
+profiler (pyinstrument, optional: pip install '.[profiling]'; cProfile text
+statistics otherwise). The report is stored for PROFILE_TTL_SECONDS under the
+request ID, which the response returns in X-Profile-Id. Fetch the report from
+GET /api/admin/profiles/{request_id}.
+
+Requests without the flag are passed straight through. No profiler is started
+for them.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.cache import get_cached_principal, get_redis
+from app.core.config import settings
+from app.core.request_context import get_request_context
+from app.core.security import decode_access_token
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional dependency
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_KEY_PREFIX = "profile:"
+_LOCAL_MAX_PROFILES = 50
+
+# In-process fallback: request_id -> (expires_at, report)
+_local_profiles: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+# Profilers hook the whole thread: one profiled request at a time per worker
+_profiling_active = False
+
+
+def _profiling_requested(scope) -> bool:
+    query_string = scope.get("query_string", b"")
+    if b"profile=" in query_string and parse_qs(query_string.decode("latin-1")).get("profile") == ["1"]:
+        return True
+    for name, value in scope.get("headers") or ():
+        if name == b"x-profile":
+            return value.strip() not in (b"", b"0")
+    return False
+
+
+async def _may_be_admin(scope) -> bool:
+    """Cheap pre-check: a valid token whose cached principal is not an admin is refused."""
+    authorization = dict(scope.get("headers") or ()).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    payload = decode_access_token(token) if scheme.lower() == "bearer" and token else None
+    if not payload or payload.get("sub") is None:
+        return False
+    principal = await get_cached_principal(int(payload["sub"]))
+    return principal is None or principal["role"] == "admin"
+
+
+class _RequestProfiler:
+    """pyinstrument sampling profiler, or cProfile when pyinstrument is not installed."""
+
+    def __init__(self):
+        if Profiler is not None:
+            self._profiler = Profiler(
+                interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, async_mode="enabled"
+            )
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        if Profiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> dict:
+        if Profiler is not None:
+            self._profiler.stop()
+            return {"content_type": "text/html", "body": self._profiler.output_html()}
+        self._profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(60)
+        # cProfile is not task-aware: concurrent requests of this worker show up too
+        return {"content_type": "text/plain", "body": output.getvalue()}
+
+
+async def store_profile(request_id: str, report: dict) -> None:
+    r = get_redis()
+    if r is not None:
+        try:
+            await r.set(f"{_PROFILE_KEY_PREFIX}{request_id}", json.dumps(report), ex=settings.PROFILE_TTL_SECONDS)
+            return
+        except Exception as e:
+            logger.warning("Profile store write error, keeping it in process: %s", e)
+
+    _local_profiles[request_id] = (time.monotonic() + settings.PROFILE_TTL_SECONDS, report)
+    _local_profiles.move_to_end(request_id)
+    while len(_local_profiles) > _LOCAL_MAX_PROFILES:
+        _local_profiles.popitem(last=False)
+
+
+async def get_profile(request_id: str) -> Optional[dict]:
+    """Stored report ({"content_type", "body"}) for a request ID, or None."""
+    r = get_redis()
+    if r is not None:
+        try:
+            raw = await r.get(f"{_PROFILE_KEY_PREFIX}{request_id}")
+            if raw is not None:
+                return json.loads(raw)
+        except Exception as e:
+            logger.warning("Profile store read error: %s", e)
+
+    entry = _local_profiles.get(request_id)
+    if entry is None or entry[0] <= time.monotonic():
+        return None
+    return entry[1]
+
+
+class ProfilingMiddleware:
+    """
+    Profile flagged admin requests (see module docstring). Must run inside
+    RequestStatsMiddleware, which provides the request context.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling_active
+        if (
+            scope["type"] != "http"
+            or not settings.PROFILING_ENABLED
+            or not _profiling_requested(scope)
+            or not await _may_be_admin(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        if _profiling_active:
+            logger.info("Profiler busy, not profiling %s %s", scope["method"], scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        context = get_request_context()
+        request_id = context.request_id if context is not None else None
+
+        async def send_with_profile_id(message):
+            if request_id and context.role == "admin" and message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", request_id)
+            await send(message)
+
+        profiler = _RequestProfiler()
+        _profiling_active = True
+        try:
+            profiler.start()
+        except Exception as e:
+            # e.g. another profiler already hooked into this thread
+            _profiling_active = False
+            logger.warning("Could not start profiler for %s %s: %s", scope["method"], scope["path"], e)
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            report = profiler.stop()
+            _profiling_active = False
+            # Authorization is only known after get_current_user ran
+            if request_id and context.role == "admin":
+                await store_profile(request_id, report)
+                logger.info("Stored profile for %s %s request_id=%s", scope["method"], scope["path"], request_id)
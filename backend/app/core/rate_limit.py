@@ -0,0 +1,222 @@
+"""
+Rate limiting shared across workers via Redis, with an in-process fallback.
+"""
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional
+
+from app.core.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Sliding window over a sorted set (score = timestamp). Uses the Redis clock so all
+# workers and instances agree on the window. Returns nil when the hit is allowed,
+# otherwise the seconds until the oldest hit leaves the window (as a string: Lua
+# numbers are truncated to integers on the way back).
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local member = ARGV[3]
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return tostring(tonumber(oldest[2]) + window - now)
+end
+redis.call('ZADD', key, now, member)
+redis.call('PEXPIRE', key, math.ceil(window * 1000))
+return nil
+"""
+
+
+# Token bucket stored in a hash (tokens, ts). Floats are written with tostring:
+# Redis would otherwise truncate Lua numbers to integers. Returns "0" when the
+# request is allowed, otherwise the seconds until a token is available.
+_TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+# Every limiter created in this process, so local state can be reset in one call
+_limiters: list = []
+
+
+def reset_local_limiters() -> None:
+    """Forget in-process state of all limiters (tests)."""
+    for limiter in _limiters:
+        limiter.reset()
+
+
+class _RedisScriptMixin:
+    """Registers the Lua script once per Redis client (EVALSHA with automatic reload)."""
+
+    _lua: str = ""
+
+    async def _run_script(self, r, keys: list, args: list):
+        if self._script is None or self._script_client is not r:
+            self._script = r.register_script(self._lua)
+            self._script_client = r
+        return await self._script(keys=keys, args=args)
+
+
+class SlidingWindowLimiter(_RedisScriptMixin):
+    """
+    At most `limit` hits per `window_seconds` for each key (e.g. client IP).
+
+    Hits are counted atomically in Redis when it is available. If Redis is down
+    (or not configured), each process falls back to its own bounded LRU of
+    recent hits — the same per-worker behaviour as before Redis was introduced.
+    """
+
+    _LOCAL_MAX_KEYS = 10_000
+    _lua = _SLIDING_WINDOW_LUA
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._local: OrderedDict[str, deque] = OrderedDict()
+        self._script = None
+        self._script_client = None
+        _limiters.append(self)
+
+    async def hit(self, key: str) -> Optional[float]:
+        """
+        Register a hit for key.
+        Returns None if allowed, otherwise seconds until the next hit would be allowed.
+        """
+        r = get_redis()
+        if r is not None:
+            try:
+                return await self._hit_redis(r, key)
+            except Exception as e:
+                logger.warning("Rate limiter '%s' Redis error, using in-process limiter: %s", self.name, e)
+        return self._hit_local(key, time.monotonic())
+
+    def reset(self) -> None:
+        """Forget in-process hits (tests, configuration reload)."""
+        self._local.clear()
+
+    async def _hit_redis(self, r, key: str) -> Optional[float]:
+        retry_after = await self._run_script(
+            r,
+            keys=[f"ratelimit:{self.name}:{key}"],
+            args=[self.window_seconds, self.limit, uuid.uuid4().hex],
+        )
+        return None if retry_after is None else max(0.0, float(retry_after))
+
+    def _hit_local(self, key: str, now: float) -> Optional[float]:
+        cutoff = now - self.window_seconds
+
+        # Keys are kept in least-recently-hit order: drop expired ones from the
+        # front, then the oldest if still over capacity (amortized O(1), no full scan)
+        while self._local:
+            oldest_key, oldest_hits = next(iter(self._local.items()))
+            if oldest_hits[-1] > cutoff and len(self._local) < self._LOCAL_MAX_KEYS:
+                break
+            del self._local[oldest_key]
+
+        hits = self._local.get(key)
+        if hits is None:
+            hits = self._local[key] = deque()
+        else:
+            self._local.move_to_end(key)
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+
+        if len(hits) >= self.limit:
+            return hits[0] + self.window_seconds - now
+        hits.append(now)
+        return None
+
+
+class TokenBucketLimiter(_RedisScriptMixin):
+    """
+    Token bucket per key: `burst` requests at once, refilled at `per_second`.
+
+    Shared across workers through Redis; falls back to a bounded per-process
+    LRU of buckets when Redis is unavailable.
+    """
+
+    _LOCAL_MAX_KEYS = 10_000
+    _lua = _TOKEN_BUCKET_LUA
+
+    def __init__(self, name: str, per_second: float, burst: int):
+        self.name = name
+        self.per_second = per_second
+        self.burst = burst
+        self._local: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._script = None
+        self._script_client = None
+        _limiters.append(self)
+
+    async def hit(self, key: str) -> Optional[float]:
+        """
+        Take a token for key.
+        Returns None if allowed, otherwise seconds until a token is available.
+        """
+        r = get_redis()
+        if r is not None:
+            try:
+                retry_after = float(await self._run_script(
+                    r,
+                    keys=[f"ratelimit:{self.name}:{key}"],
+                    args=[self.per_second, self.burst],
+                ))
+                return retry_after if retry_after > 0 else None
+            except Exception as e:
+                logger.warning("Rate limiter '%s' Redis error, using in-process limiter: %s", self.name, e)
+        return self._hit_local(key, time.monotonic())
+
+    def reset(self) -> None:
+        """Forget in-process buckets."""
+        self._local.clear()
+
+    def _hit_local(self, key: str, now: float) -> Optional[float]:
+        state = self._local.pop(key, None)
+        if state is None:
+            tokens = float(self.burst)
+        else:
+            tokens, ts = state
+            tokens = min(self.burst, tokens + max(0.0, now - ts) * self.per_second)
+        if len(self._local) >= self._LOCAL_MAX_KEYS:
+            # Least recently used bucket first; an evicted bucket simply starts full again
+            self._local.popitem(last=False)
+
+        retry_after = None
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.per_second
+        self._local[key] = (tokens, now)
+        return retry_after
+
+
+def retry_after_header(seconds: float) -> dict[str, str]:
+    """Retry-After header value (whole seconds, at least 1)."""
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
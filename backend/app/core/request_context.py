@@ -0,0 +1,60 @@
+"""
+Per-request context shared by middleware, SQL hooks and logging (contextvars).
+"""
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RequestContext:
+    """Request identity and the SQL statistics collected while handling it."""
+    request_id: str
+    method: str = ""
+    path: str = ""
+    # Authenticated user, set by get_current_user
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+    query_count: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: Optional[str] = None
+    statement_counts: Counter = field(default_factory=Counter)
+    scope: Optional[dict] = field(default=None, repr=False)
+
+    @property
+    def route(self) -> str:
+        """Route template once the request is routed (/api/admin/spo/{spo_id}), the raw path before."""
+        route = self.scope.get("route") if self.scope is not None else None
+        return route.path if route is not None else self.path
+
+    def record_query(self, normalized_statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.db_seconds += seconds
+        self.statement_counts[normalized_statement] += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = normalized_statement
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Context of the request being handled, or None outside of a request."""
+    return _current.get()
+
+
+def get_request_id() -> Optional[str]:
+    context = _current.get()
+    return context.request_id if context else None
+
+
+def set_request_context(context: RequestContext):
+    """Bind context to the current task; returns a token for reset_request_context."""
+    return _current.set(context)
+
+
+def reset_request_context(token) -> None:
+    _current.reset(token)
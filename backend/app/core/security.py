@@ -1,6 +1,16 @@
 """
 Security utilities: password hashing and JWT token handling.
 """
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any
 
@@ -8,10 +18,58 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_QUEUE_SECONDS, PASSWORD_HASH_REJECTED, PASSWORD_HASH_SECONDS
+
+
+_PASSWORD_SCHEMES = ("bcrypt", "argon2")
+
+
+def _argon2_available() -> bool:
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_password_context(
+    scheme: Optional[str] = None,
+    bcrypt_rounds: Optional[int] = None,
+    argon2_time_cost: Optional[int] = None,
+) -> CryptContext:
+    """
+    Password hashing policy from settings (arguments override, see scripts/bench_password_hash.py).
+
+    New hashes use the configured scheme and cost. Hashes made with the other
+    scheme or a lower cost still verify but are reported as needing an update,
+    so they are transparently rehashed on the next successful login.
+    """
+    scheme = scheme or settings.PASSWORD_HASH_SCHEME
+    if scheme not in _PASSWORD_SCHEMES:
+        raise ValueError(f"Unsupported PASSWORD_HASH_SCHEME: {scheme}")
+    if scheme == "argon2" and not _argon2_available():
+        raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires argon2-cffi (pip install '.[argon2]')")
+
+    rounds = bcrypt_rounds or settings.BCRYPT_ROUNDS
+    options = {
+        "bcrypt__default_rounds": rounds,
+        "bcrypt__min_rounds": rounds,
+    }
+    schemes = [scheme] + [other for other in _PASSWORD_SCHEMES if other != scheme]
+    if _argon2_available():
+        options.update(
+            argon2__time_cost=argon2_time_cost or settings.ARGON2_TIME_COST,
+            argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+            argon2__parallelism=settings.ARGON2_PARALLELISM,
+        )
+    else:
+        # Existing argon2 hashes cannot be verified without the library anyway
+        schemes.remove("argon2")
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
 
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_password_context()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -19,11 +77,159 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
     return pwd_context.hash(password)
 
 
+class PasswordHashingOverloaded(Exception):
+    """Raised when the hashing executor is saturated (load shedding, mapped to 503)."""
+
+
+# Thread pool for request-path hashing: bcrypt releases the GIL, so a few threads
+# keep logins off the event loop. Lazily created, see _run_hashing.
+_hash_executor: Optional[ThreadPoolExecutor] = None
+# Calls submitted and not finished in the executor; released from the worker thread
+_hash_in_flight = 0
+_hash_in_flight_lock = threading.Lock()
+_hash_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "hash_seconds_total": 0.0,
+    "hash_seconds_max": 0.0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+}
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.PASSWORD_HASH_CONCURRENCY),
+            thread_name_prefix="password-hash",
+        )
+    return _hash_executor
+
+
+def _release_hash_slot(_future=None) -> None:
+    global _hash_in_flight
+    with _hash_in_flight_lock:
+        _hash_in_flight -= 1
+
+
+async def _run_hashing(func, *args):
+    """
+    Run a bcrypt call in the hashing executor.
+    At most PASSWORD_HASH_CONCURRENCY calls run at once and PASSWORD_HASH_MAX_QUEUE wait
+    behind them; anything beyond that is rejected with PasswordHashingOverloaded.
+    """
+    global _hash_in_flight
+    with _hash_in_flight_lock:
+        if _hash_in_flight >= settings.PASSWORD_HASH_CONCURRENCY + settings.PASSWORD_HASH_MAX_QUEUE:
+            _hash_stats["rejected"] += 1
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHashingOverloaded()
+        _hash_in_flight += 1
+
+    submitted = time.perf_counter()
+
+    def timed_call():
+        started = time.perf_counter()
+        result = func(*args)
+        return result, started - submitted, time.perf_counter() - started
+
+    try:
+        future = _get_hash_executor().submit(timed_call)
+    except BaseException:
+        _release_hash_slot()
+        raise
+    # Released when the call finishes in its thread (or is cancelled before it starts),
+    # not when the awaiting request goes away: a cancelled login still occupies a thread
+    future.add_done_callback(_release_hash_slot)
+    result, queue_seconds, hash_seconds = await asyncio.wrap_future(future)
+
+    _hash_stats["completed"] += 1
+    _hash_stats["hash_seconds_total"] += hash_seconds
+    _hash_stats["hash_seconds_max"] = max(_hash_stats["hash_seconds_max"], hash_seconds)
+    _hash_stats["queue_seconds_total"] += queue_seconds
+    _hash_stats["queue_seconds_max"] = max(_hash_stats["queue_seconds_max"], queue_seconds)
+    PASSWORD_HASH_SECONDS.observe(hash_seconds)
+    PASSWORD_HASH_QUEUE_SECONDS.observe(queue_seconds)
+    return result
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop."""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """verify_and_update_password without blocking the event loop."""
+    return await _run_hashing(verify_and_update_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash without blocking the event loop."""
+    return await _run_hashing(get_password_hash, password)
+
+
+def get_hashing_stats() -> dict:
+    """Snapshot of hashing executor metrics (latency and queue time in seconds)."""
+    completed = _hash_stats["completed"]
+    return {
+        **_hash_stats,
+        "in_flight": _hash_in_flight,
+        "hash_seconds_avg": _hash_stats["hash_seconds_total"] / completed if completed else 0.0,
+        "queue_seconds_avg": _hash_stats["queue_seconds_total"] / completed if completed else 0.0,
+    }
+
+
+def shutdown_hash_executor() -> None:
+    """Stop the hashing thread pool (application shutdown)."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+# Process pool for bulk hashing (lazily created, see hash_passwords_parallel)
+_hash_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_hash_process_pool() -> ProcessPoolExecutor:
+    """Create the hashing process pool on first use ("spawn": safe with a running event loop)."""
+    global _hash_process_pool
+    if _hash_process_pool is None:
+        _hash_process_pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_PROCESSES or None,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_process_pool
+
+
+async def hash_passwords_parallel(passwords: list[str]) -> list[str]:
+    """Hash many passwords in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _get_hash_process_pool()
+    return list(await asyncio.gather(
+        *(loop.run_in_executor(pool, get_password_hash, password) for password in passwords)
+    ))
+
+
+def shutdown_hash_process_pool() -> None:
+    """Stop the hashing process pool (application shutdown)."""
+    global _hash_process_pool
+    if _hash_process_pool is not None:
+        _hash_process_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_process_pool = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
     to_encode = data.copy()
@@ -36,10 +242,79 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode JWT access token."""
+# Validated claims by token digest, kept until the token's exp (see decode_access_token)
+_token_cache: "OrderedDict[bytes, dict]" = OrderedDict()
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_hs256(token: str) -> Optional[dict]:
+    """
+    Verify an HS256 token with the standard library (hmac + json).
+    Several times cheaper than python-jose for the one algorithm we issue;
+    validates signature, exp and nbf the same way.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            return None
+        expected = hmac.new(
+            settings.SECRET_KEY.encode(), f"{header_b64}.{payload_b64}".encode("ascii"), hashlib.sha256
+        ).digest()
+        if not hmac.compare_digest(expected, _b64url_decode(signature_b64)):
+            return None
+        payload = json.loads(_b64url_decode(payload_b64))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    now = time.time()
+    for claim in ("exp", "nbf"):
+        if claim in payload and not isinstance(payload[claim], (int, float)):
+            return None
+    if "exp" in payload and payload["exp"] <= now:
+        return None
+    if "nbf" in payload and payload["nbf"] > now:
+        return None
+    return payload
+
+
+def _decode_verified(token: str) -> Optional[dict]:
+    if settings.ALGORITHM == "HS256":
+        return _decode_hs256(token)
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         return None
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    Decode JWT access token.
+    Validated claims are cached (bounded LRU keyed by token digest) until the
+    token expires, so repeated requests with the same token skip verification.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _token_cache.get(digest)
+    if claims is not None:
+        if claims["exp"] > time.time():
+            _token_cache.move_to_end(digest)
+            return dict(claims)
+        del _token_cache[digest]
+        return None
+
+    payload = _decode_verified(token)
+    if payload is None:
+        return None
+
+    # Only tokens with an expiry are cached (ours always have one)
+    if isinstance(payload.get("exp"), (int, float)) and settings.TOKEN_CACHE_SIZE > 0:
+        if len(_token_cache) >= settings.TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+        _token_cache[digest] = payload
+        return dict(payload)
+    return payload
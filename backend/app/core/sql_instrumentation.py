@@ -0,0 +1,63 @@
+"""
+SQL instrumentation: per-request query statistics and the slow-query log
+(logger "app.sql.slow", see app.core.logging_config for the optional file).
+
+Hooks are registered on the Engine class, so every engine (primary, replica,
+tests) reports into the RequestContext of the request being handled.
+"""
+import logging
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.request_context import get_request_context, get_request_id
+
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\((?:\s*(?:\?|\$\d+|%s|:\w+)\s*,)+\s*(?:\?|\$\d+|%s|:\w+)\s*\)")
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace, literals and expanded IN lists so equal queries group together."""
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    statement = _STRING_RE.sub("?", statement)
+    statement = _NUMBER_RE.sub("?", statement)
+    return _PLACEHOLDER_LIST_RE.sub("(...)", statement)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+
+    request_context = get_request_context()
+    normalized = None
+    if request_context is not None:
+        normalized = normalize_statement(statement)
+        request_context.record_query(normalized, elapsed)
+
+    if settings.SQL_SLOW_QUERY_MS and elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "Slow query %.1f ms request_id=%s: %s",
+            elapsed * 1000, get_request_id(), normalized or normalize_statement(statement),
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute is not called for failed statements
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
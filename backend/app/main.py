@@ -1,89 +1,134 @@
 """
 FastAPI application entry point.
 """
+import asyncio
 import logging
-import uuid
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select, text
+from sqlalchemy import text
 
 from app.core.config import settings
 from app.core.database import engine, Base, AsyncSessionLocal, init_db
 from app.core.cache import init_cache, close_cache
-from app.core.security import get_password_hash, verify_password
-from app.models import User, UserRole, Settings
-from app.services import init_settings
+from app.core.loop_monitor import start_loop_monitor, stop_loop_monitor
+from app.core.metrics import CONTENT_TYPE_LATEST, render_metrics, start_metrics_sampler, stop_metrics_sampler
+from app.core.middleware import (
+    CompressionMiddleware,
+    MetricsMiddleware,
+    RateLimitMiddleware,
+    RequestIdMiddleware,
+    RequestStatsMiddleware,
+)
+from app.core.profiling import ProfilingMiddleware
+from app.core.logging_config import configure_logging
+from app.core.security import (
+    shutdown_hash_executor,
+    shutdown_hash_process_pool,
+    PasswordHashingOverloaded,
+)
+from app.services import init_settings, ensure_admin_from_env, sync_admin_password_from_env
 from app.api import auth_router, admin_router, operator_router, stats_router
 
 
-# Configure structured logging (SUGGEST-004)
-logging.basicConfig(
-    level=logging.INFO,
-    format='{"time":"%(asctime)s","level":"%(levelname)s","logger":"%(name)s","message":"%(message)s"}',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
+# Structured JSON logging written by a background thread (SUGGEST-004)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
+# Admin password check started by create_initial_admin; startup does not wait for it
+_admin_password_task: Optional[asyncio.Task] = None
+
+
 async def create_initial_admin():
-    """Create initial admin user if not exists."""
+    """
+    Create initial admin user if not exists, or sync its login from the environment.
+    Verifying an existing admin's password (bcrypt) is left to a background task.
+    """
+    global _admin_password_task
     async with AsyncSessionLocal() as db:
         try:
-            result = await db.execute(select(User).where(User.role == UserRole.ADMIN))
-            admin = result.scalars().first()
-            if not admin:
-                admin = User(
-                    login=settings.ADMIN_LOGIN,
-                    password_hash=get_password_hash(settings.ADMIN_PASSWORD),
-                    role=UserRole.ADMIN,
-                    spo_id=None
-                )
-                db.add(admin)
-                await db.commit()
-                logger.info(f"Admin user created with login: {settings.ADMIN_LOGIN}")
+            status = await ensure_admin_from_env(db)
+        except Exception as e:
+            logger.error("Error during admin initialization: %s", e)
+            await db.rollback()
+            return
+
+    if status == "created":
+        logger.info("Admin user created with login: %s", settings.ADMIN_LOGIN)
+        return
+    if status == "updated":
+        logger.info("Admin login synced from environment")
+    _admin_password_task = asyncio.create_task(sync_admin_password())
+
+
+async def sync_admin_password():
+    """Bring the admin password hash in line with ADMIN_PASSWORD (after startup)."""
+    async with AsyncSessionLocal() as db:
+        try:
+            if await sync_admin_password_from_env(db) == "updated":
+                logger.info("Admin password synced from environment")
             else:
-                changed = False
-                if admin.login != settings.ADMIN_LOGIN:
-                    admin.login = settings.ADMIN_LOGIN
-                    changed = True
-                try:
-                    password_matches = verify_password(settings.ADMIN_PASSWORD, admin.password_hash)
-                except Exception as exc:
-                    logger.warning(f"Admin password hash unreadable, will rehash: {exc}")
-                    password_matches = False
-                if not password_matches:
-                    admin.password_hash = get_password_hash(settings.ADMIN_PASSWORD)
-                    changed = True
-                if changed:
-                    await db.commit()
-                    logger.info("Admin credentials synced from environment")
-                else:
-                    logger.info("Admin credentials unchanged")
-
-            # Initialize settings
+                logger.info("Admin password unchanged")
+        except Exception as e:
+            logger.error("Error during admin password sync: %s", e)
+            await db.rollback()
+
+
+async def initialize_settings():
+    """Create default settings rows."""
+    async with AsyncSessionLocal() as db:
+        try:
             await init_settings(db)
             logger.info("Settings initialized")
-
         except Exception as e:
-            logger.error(f"Error during initialization: {e}")
+            logger.error("Error during settings initialization: %s", e)
             await db.rollback()
 
 
+async def _timed(phase: str, step) -> None:
+    """Await a startup step and log how long it took."""
+    started = time.perf_counter()
+    await step
+    logger.info("Startup phase '%s' finished in %.1f ms", phase, (time.perf_counter() - started) * 1000)
+
+
+async def _prepare_database():
+    await _timed("schema", init_db())
+    # Both only need the schema and use separate sessions
+    await asyncio.gather(
+        _timed("admin", create_initial_admin()),
+        _timed("settings", initialize_settings()),
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan - startup and shutdown events."""
-    # Startup
+    # Startup: Redis and database preparation are independent
     logger.info("Starting application...")
-    await init_db()
-    logger.info("Database tables created")
-    await create_initial_admin()
-    await init_cache()
+    started = time.perf_counter()
+    await asyncio.gather(
+        _timed("cache", init_cache()),
+        _timed("database", _prepare_database()),
+    )
+    logger.info("Application ready in %.1f ms", (time.perf_counter() - started) * 1000)
+    start_metrics_sampler()
+    start_loop_monitor()
     yield
     # Shutdown
     logger.info("Shutting down application...")
+    if _admin_password_task is not None and not _admin_password_task.done():
+        _admin_password_task.cancel()
+    await stop_loop_monitor()
+    await stop_metrics_sampler()
     await close_cache()
+    shutdown_hash_executor()
+    shutdown_hash_process_pool()
 
 
 # Create FastAPI app
@@ -106,6 +151,9 @@ else:
     cors_origins = [origin.strip() for origin in settings.CORS_ORIGINS.split(",")]
     allow_credentials = True
 
+# Rate limiting / load shedding; added before CORS so rejections still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -115,17 +163,34 @@ app.add_middleware(
 )
 
 
-# Request ID middleware for tracing (SUGGEST-002)
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    """Add X-Request-ID header to all requests for tracing."""
-    request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    # Store in request state for use in logging
-    request.state.request_id = request_id
+# On-demand profiling of admin requests; inside RequestStatsMiddleware (needs the request context)
+app.add_middleware(ProfilingMiddleware)
 
-    response: Response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    return response
+# Per-request SQL statistics (Server-Timing, query budget, N+1 warnings)
+app.add_middleware(RequestStatsMiddleware)
+
+# Prometheus request metrics; outside the rate limiter so 429/503 are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+# gzip / brotli for JSON and text bodies (stats, 1000-row student lists)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Request ID for tracing (SUGGEST-002); outermost, every other layer can use it
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.exception_handler(PasswordHashingOverloaded)
+async def password_hashing_overloaded_handler(request: Request, exc: PasswordHashingOverloaded):
+    """Shed load when the password hashing executor is saturated."""
+    logger.warning("Password hashing executor saturated, rejecting %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry later"},
+        headers={"Retry-After": "1"},
+    )
 
 
 # Include routers
@@ -160,8 +225,18 @@ async def health_check():
             await db.execute(text("SELECT 1"))
         health_status["checks"]["database"] = "healthy"
     except Exception as e:
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
         health_status["status"] = "unhealthy"
         health_status["checks"]["database"] = "unhealthy"
 
     return health_status
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Prometheus metrics of all workers (see app.core.metrics).
+        Not proxied by nginx: scrape backend:8000 from the internal network.
+        """
+        return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -3,7 +3,7 @@ Student model for enrolled students.
 """
 from datetime import datetime, timezone, timedelta
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -17,12 +17,30 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     specialty_id = Column(Integer, ForeignKey("specialties.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Denormalized from specialties.spo_id so operator queries can scope by SPO
+    # without joining specialties. Must be kept in sync when specialty_id changes.
+    spo_id = Column(Integer, ForeignKey("spo.id", ondelete="CASCADE"), nullable=False)
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=False)
     middle_name = Column(String(100), nullable=True)
     certificate_number = Column(String(50), unique=True, nullable=False, index=True)
     created_at = Column(DateTime, default=lambda: datetime.now(MSK).replace(tzinfo=None), nullable=False)
 
+    # Composite indexes backing SPO-scoped sorting/filtering in the operator student list
+    __table_args__ = (
+        Index('ix_students_spo_created', 'spo_id', 'created_at', 'id'),
+        Index('ix_students_spo_specialty', 'spo_id', 'specialty_id'),
+        Index('ix_students_spo_name', 'spo_id', 'last_name', 'first_name', 'id'),
+        Index('ix_students_spo_certificate', 'spo_id', 'certificate_number'),
+        # Prefix search on last name: LIKE 'x%' needs pattern ops under non-C collations
+        Index(
+            'ix_students_spo_last_name_search',
+            spo_id,
+            func.lower(last_name).label('last_name_lower'),
+            postgresql_ops={'last_name_lower': 'varchar_pattern_ops'},
+        ),
+    )
+
     # Relationships
     specialty = relationship("Specialty", back_populates="students", lazy="raise")
 
@@ -9,6 +9,7 @@ from app.schemas.user import (
     BulkOperatorCreateResponse,
     DocxExportRequest,
     TokenResponse,
+    RefreshTokenRequest,
     CurrentUser
 )
 from app.schemas.spo import (
@@ -39,7 +40,10 @@ from app.schemas.student import (
     StudentCreate,
     StudentUpdate,
     StudentResponse,
-    StudentWithSpecialty
+    StudentWithSpecialty,
+    StudentMove,
+    StudentBatchRequest,
+    StudentBatchResponse
 )
 from app.schemas.settings import (
     SettingsBase,
@@ -55,13 +59,14 @@ from app.schemas.stats import (
 __all__ = [
     "UserBase", "UserCreate", "UserLogin", "UserResponse", "UserWithPassword",
     "OperatorCredential", "BulkOperatorCreateResponse", "DocxExportRequest",
-    "TokenResponse", "CurrentUser",
+    "TokenResponse", "RefreshTokenRequest", "CurrentUser",
     "SPOBase", "SPOCreate", "SPOUpdate", "SPOResponse", "SPOWithStats",
     "SpecialtyTemplateBase", "SpecialtyTemplateCreate", "SpecialtyTemplateUpdate",
     "SpecialtyTemplateResponse", "SpecialtyTemplateWithUsage",
     "SpecialtyBase", "SpecialtyCreate", "SpecialtyUpdate", "QuotaUpdate",
     "SpecialtyResponse", "SpecialtyWithStats", "SpecialtyAssign",
     "StudentBase", "StudentCreate", "StudentUpdate", "StudentResponse", "StudentWithSpecialty",
+    "StudentMove", "StudentBatchRequest", "StudentBatchResponse",
     "SettingsBase", "SettingsUpdate", "SettingsResponse",
     "SpecialtyStats", "SPOStats", "OverallStats"
 ]
@@ -2,10 +2,10 @@
 Pydantic schemas for Student model.
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import re
 
-from pydantic import BaseModel, Field, computed_field, field_validator
+from pydantic import BaseModel, Field, computed_field, field_validator, model_validator
 
 
 class StudentBase(BaseModel):
@@ -70,3 +70,31 @@ class StudentWithSpecialty(StudentResponse):
     """Schema for student with specialty info."""
     specialty_name: Optional[str] = None
     spo_name: Optional[str] = None
+
+
+class StudentMove(BaseModel):
+    """Single student move inside a batch request."""
+    student_id: int
+    specialty_id: int = Field(..., description="Target specialty ID")
+
+
+class StudentBatchRequest(BaseModel):
+    """Schema for moving and deleting several students at once."""
+    moves: List[StudentMove] = Field(default_factory=list, max_length=1000)
+    delete_ids: List[int] = Field(default_factory=list, max_length=1000)
+
+    @model_validator(mode='after')
+    def validate_students_unique(self):
+        """Every student may appear in the batch only once."""
+        student_ids = [move.student_id for move in self.moves] + self.delete_ids
+        if not student_ids:
+            raise ValueError('Пакет изменений пуст')
+        if len(student_ids) != len(set(student_ids)):
+            raise ValueError('Каждый студент может встречаться в пакете только один раз')
+        return self
+
+
+class StudentBatchResponse(BaseModel):
+    """Result of a batch student mutation."""
+    moved: int = 0
+    deleted: int = 0
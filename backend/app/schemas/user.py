@@ -63,9 +63,15 @@ class DocxExportRequest(BaseModel):
 class TokenResponse(BaseModel):
     """Schema for JWT token response."""
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
 
 
+class RefreshTokenRequest(BaseModel):
+    """Schema for token refresh and logout."""
+    refresh_token: str = Field(..., min_length=1, max_length=200)
+
+
 class CurrentUser(BaseModel):
     """Schema for current user info."""
     id: int
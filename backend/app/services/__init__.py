@@ -1,12 +1,22 @@
 """Services module - business logic layer."""
 from app.services.user_service import (
     generate_login,
+    allocate_logins,
     generate_password,
     create_operator,
+    provision_operators,
     reset_password,
     authenticate_user,
     get_user_by_id,
-    get_user_by_login
+    get_user_by_login,
+    ensure_admin_from_env,
+    sync_admin_password_from_env
+)
+from app.services.session_service import (
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens
 )
 from app.services.settings_service import (
     get_base_quota,
@@ -15,7 +25,11 @@ from app.services.settings_service import (
 )
 
 __all__ = [
-    "generate_login", "generate_password", "create_operator", "reset_password",
+    "generate_login", "allocate_logins", "generate_password", "create_operator",
+    "provision_operators", "reset_password",
     "authenticate_user", "get_user_by_id", "get_user_by_login",
+    "ensure_admin_from_env", "sync_admin_password_from_env",
+    "issue_refresh_token", "rotate_refresh_token", "revoke_refresh_token",
+    "revoke_user_refresh_tokens",
     "get_base_quota", "set_base_quota", "init_settings"
 ]
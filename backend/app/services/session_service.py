@@ -0,0 +1,151 @@
+"""
+Session service - rotating refresh tokens stored server-side.
+
+Refresh tokens are opaque random strings; only their SHA-256 digest is stored
+(Redis, shared by all workers). Each refresh consumes the token and issues a
+new one. Presenting an already rotated token is treated as theft and revokes
+every session of that user. Without Redis the store falls back to process
+memory (sessions then survive only as long as the worker).
+"""
+import hashlib
+import logging
+import secrets
+import time
+from typing import Optional
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_KEY_PREFIX = "refresh:"
+_USED_KEY_PREFIX = "refresh_used:"
+_USER_KEY_PREFIX = "refresh_user:"
+
+_LOCAL_MAX_TOKENS = 10_000
+
+# In-process fallback: digest -> (user_id, expires_at)
+_local_tokens: dict[str, tuple[int, float]] = {}
+_local_used: dict[str, tuple[int, float]] = {}
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _ttl_seconds() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+
+def _prune_local(store: dict, now: float) -> None:
+    """Drop expired entries once the store grows large (amortized over many inserts)."""
+    if len(store) < _LOCAL_MAX_TOKENS:
+        return
+    for digest in [d for d, (_, expires_at) in store.items() if expires_at <= now]:
+        del store[digest]
+
+
+def _pop_local(store: dict, digest: str) -> Optional[int]:
+    entry = store.pop(digest, None)
+    if entry is None or entry[1] <= time.time():
+        return None
+    return entry[0]
+
+
+async def issue_refresh_token(user_id: int) -> str:
+    """Create a new refresh token for user."""
+    token = secrets.token_urlsafe(32)
+    digest = _digest(token)
+    ttl = _ttl_seconds()
+
+    r = get_redis()
+    if r is not None:
+        try:
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.set(f"{_TOKEN_KEY_PREFIX}{digest}", user_id, ex=ttl)
+                pipe.sadd(f"{_USER_KEY_PREFIX}{user_id}", digest)
+                pipe.expire(f"{_USER_KEY_PREFIX}{user_id}", ttl)
+                await pipe.execute()
+            return token
+        except Exception as e:
+            logger.warning("Session store write error, using in-process store: %s", e)
+
+    now = time.time()
+    _prune_local(_local_tokens, now)
+    _local_tokens[digest] = (user_id, now + ttl)
+    return token
+
+
+async def _consume(digest: str) -> tuple[Optional[int], Optional[int]]:
+    """Atomically take a live token. Returns (owner, None) or (None, owner of a reused token)."""
+    r = get_redis()
+    if r is not None:
+        try:
+            user_id = await r.getdel(f"{_TOKEN_KEY_PREFIX}{digest}")
+            if user_id is not None:
+                async with r.pipeline(transaction=True) as pipe:
+                    pipe.set(f"{_USED_KEY_PREFIX}{digest}", user_id, ex=_ttl_seconds())
+                    pipe.srem(f"{_USER_KEY_PREFIX}{user_id}", digest)
+                    await pipe.execute()
+                return int(user_id), None
+            reused_by = await r.get(f"{_USED_KEY_PREFIX}{digest}")
+            return None, int(reused_by) if reused_by is not None else None
+        except Exception as e:
+            logger.warning("Session store read error, using in-process store: %s", e)
+
+    user_id = _pop_local(_local_tokens, digest)
+    if user_id is not None:
+        now = time.time()
+        _prune_local(_local_used, now)
+        _local_used[digest] = (user_id, now + _ttl_seconds())
+        return user_id, None
+    entry = _local_used.get(digest)
+    return None, entry[0] if entry is not None else None
+
+
+async def rotate_refresh_token(token: str) -> Optional[tuple[int, str]]:
+    """
+    Exchange a refresh token for a new one.
+    Returns (user_id, new_refresh_token), or None if the token is unknown,
+    expired, revoked or was already used.
+    """
+    user_id, reused_by = await _consume(_digest(token))
+    if user_id is None:
+        if reused_by is not None:
+            logger.warning("Refresh token reuse detected for user %s, revoking all sessions", reused_by)
+            await revoke_user_refresh_tokens(reused_by)
+        return None
+    return user_id, await issue_refresh_token(user_id)
+
+
+async def revoke_refresh_token(token: str) -> None:
+    """Revoke a single refresh token (logout)."""
+    digest = _digest(token)
+    r = get_redis()
+    if r is not None:
+        try:
+            user_id = await r.getdel(f"{_TOKEN_KEY_PREFIX}{digest}")
+            if user_id is not None:
+                await r.srem(f"{_USER_KEY_PREFIX}{user_id}", digest)
+        except Exception as e:
+            logger.warning("Session store revoke error: %s", e)
+    _local_tokens.pop(digest, None)
+
+
+async def revoke_user_refresh_tokens(*user_ids: int) -> None:
+    """Revoke every refresh token of the given users (deletion, password reset)."""
+    if not user_ids:
+        return
+    r = get_redis()
+    if r is not None:
+        try:
+            for user_id in user_ids:
+                user_key = f"{_USER_KEY_PREFIX}{user_id}"
+                digests = await r.smembers(user_key)
+                await r.delete(user_key, *(f"{_TOKEN_KEY_PREFIX}{digest}" for digest in digests))
+        except Exception as e:
+            logger.warning("Session store revoke error: %s", e)
+
+    revoked = set(user_ids)
+    for digest in [d for d, (owner, _) in _local_tokens.items() if owner in revoked]:
+        del _local_tokens[digest]
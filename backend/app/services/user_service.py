@@ -6,11 +6,17 @@ import secrets
 import string
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, insert, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User, UserRole
-from app.core.security import get_password_hash, verify_password
+from app.core.config import settings as app_settings
+from app.core.security import (
+    get_password_hash_async,
+    verify_and_update_password_async,
+    hash_passwords_parallel
+)
 
 
 def _extract_meaningful_part(spo_name: str) -> str:
@@ -21,23 +27,26 @@ def _extract_meaningful_part(spo_name: str) -> str:
     return spo_name
 
 
-async def generate_login(spo_name: str, db: AsyncSession) -> str:
-    """Generate unique login for operator based on SPO name."""
-    transliteration = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-        ' ': '_', '-': '_'
-    }
+_TRANSLITERATION = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    ' ': '_', '-': '_'
+}
+
+_MAX_LOGIN_ATTEMPTS = 100
 
+
+def _base_login(spo_name: str) -> str:
+    """Transliterate the meaningful part of the SPO name into a login (without uniqueness suffix)."""
     source = _extract_meaningful_part(spo_name)
 
     base_login = ""
     for char in source.lower():
-        if char in transliteration:
-            base_login += transliteration[char]
+        if char in _TRANSLITERATION:
+            base_login += _TRANSLITERATION[char]
         elif char.isalnum():
             base_login += char
 
@@ -53,22 +62,57 @@ async def generate_login(spo_name: str, db: AsyncSession) -> str:
     if not base_login:
         base_login = "operator"
 
-    # Check uniqueness and add suffix if needed
+    return base_login
+
+
+def _first_free_login(base_login: str, taken: set[str]) -> str:
+    """Return base_login or base_login_N, whichever is first not in taken."""
     login = base_login
     counter = 1
-    max_attempts = 100
-    while True:
-        result = await db.execute(select(User).where(User.login == login))
-        if result.scalars().first() is None:
-            break
+    while login in taken:
         login = f"{base_login}_{counter}"
         counter += 1
-        if counter > max_attempts:
-            raise RuntimeError(f"Could not generate unique login after {max_attempts} attempts")
-
+        if counter > _MAX_LOGIN_ATTEMPTS:
+            raise RuntimeError(f"Could not generate unique login after {_MAX_LOGIN_ATTEMPTS} attempts")
     return login
 
 
+async def _taken_logins(db: AsyncSession, base_logins: set[str]) -> set[str]:
+    """Fetch every existing login that starts with one of the bases, in one query."""
+    result = await db.execute(
+        select(User.login).where(
+            or_(*(User.login.startswith(base, autoescape=True) for base in base_logins))
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def generate_login(spo_name: str, db: AsyncSession) -> str:
+    """Generate unique login for operator based on SPO name."""
+    base_login = _base_login(spo_name)
+    taken = await _taken_logins(db, {base_login})
+    return _first_free_login(base_login, taken)
+
+
+async def allocate_logins(db: AsyncSession, spo_names: list[str]) -> list[str]:
+    """
+    Generate unique logins for several SPOs at once.
+    Existing logins are fetched with one prefix query; logins allocated earlier
+    in the same batch are reserved too, so equal SPO names get distinct suffixes.
+    """
+    base_logins = [_base_login(name) for name in spo_names]
+    if not base_logins:
+        return []
+
+    taken = await _taken_logins(db, set(base_logins))
+    logins = []
+    for base_login in base_logins:
+        login = _first_free_login(base_login, taken)
+        taken.add(login)
+        logins.append(login)
+    return logins
+
+
 def generate_password(length: int = 12) -> str:
     """Generate secure random password."""
     alphabet = string.ascii_letters + string.digits
@@ -87,20 +131,67 @@ async def create_operator(db: AsyncSession, spo_id: int, spo_name: str) -> tuple
     """Create operator for SPO with generated credentials."""
     login = await generate_login(spo_name, db)
     password = generate_password()
+    password_hash = await get_password_hash_async(password)
 
-    user = User(
-        login=login,
-        password_hash=get_password_hash(password),
-        role=UserRole.OPERATOR,
-        spo_id=spo_id
-    )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    try:
+        result = await db.execute(
+            insert(User)
+            .values(
+                login=login,
+                password_hash=password_hash,
+                role=UserRole.OPERATOR,
+                spo_id=spo_id
+            )
+            .returning(User)
+        )
+        user = result.scalars().one()
+        await db.commit()
+    except IntegrityError:
+        # SPO already has an operator (unique operator index) or login was taken concurrently
+        await db.rollback()
+        raise
 
     return user, password
 
 
+async def provision_operators(db: AsyncSession, spos: list[tuple[int, str]]) -> list[tuple[User, str]]:
+    """
+    Create operators for several SPOs in one transaction.
+    - logins are allocated with a single prefix query
+    - passwords are hashed in parallel in a process pool (off the event loop)
+    - all rows are written with one multi-row INSERT ... RETURNING
+
+    Either every operator is created or none (IntegrityError is re-raised after rollback).
+    """
+    if not spos:
+        return []
+
+    logins = await allocate_logins(db, [spo_name for _, spo_name in spos])
+    passwords = [generate_password() for _ in spos]
+    password_hashes = await hash_passwords_parallel(passwords)
+
+    rows = [
+        {
+            "login": login,
+            "password_hash": password_hash,
+            "role": UserRole.OPERATOR,
+            "spo_id": spo_id,
+        }
+        for (spo_id, _), login, password_hash in zip(spos, logins, password_hashes)
+    ]
+    try:
+        # Multi-row INSERT ... RETURNING; row order is not guaranteed, so results
+        # are matched back by spo_id (unique within the batch)
+        result = await db.scalars(insert(User).returning(User), rows)
+        users = {user.spo_id: user for user in result.all()}
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+
+    return [(users[spo_id], password) for (spo_id, _), password in zip(spos, passwords)]
+
+
 async def reset_password(db: AsyncSession, user_id: int) -> tuple[User, str]:
     """Reset password for user, returning user and new password."""
     result = await db.execute(select(User).where(User.id == user_id))
@@ -109,7 +200,7 @@ async def reset_password(db: AsyncSession, user_id: int) -> tuple[User, str]:
         raise ValueError("User not found")
 
     password = generate_password()
-    user.password_hash = get_password_hash(password)
+    user.password_hash = await get_password_hash_async(password)
     await db.commit()
     await db.refresh(user)
 
@@ -122,8 +213,13 @@ async def authenticate_user(db: AsyncSession, login: str, password: str) -> Opti
     user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash is not None:
+        # Stored hash uses an outdated scheme or cost: upgrade it while the password is known
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
 
@@ -137,3 +233,64 @@ async def get_user_by_login(db: AsyncSession, login: str) -> Optional[User]:
     """Get user by login."""
     result = await db.execute(select(User).where(User.login == login))
     return result.scalars().first()
+
+
+async def ensure_admin_from_env(db: AsyncSession) -> str:
+    """
+    Create the admin from ADMIN_LOGIN/ADMIN_PASSWORD if there is none, or sync its login.
+
+    An existing admin costs one query and no password hashing, so this is what
+    startup waits for; the password is synced by sync_admin_password_from_env.
+
+    Returns "created", "updated" or "unchanged".
+    """
+    result = await db.execute(select(User).where(User.role == UserRole.ADMIN))
+    admin = result.scalars().first()
+
+    if admin is None:
+        db.add(User(
+            login=app_settings.ADMIN_LOGIN,
+            password_hash=await get_password_hash_async(app_settings.ADMIN_PASSWORD),
+            role=UserRole.ADMIN,
+            spo_id=None
+        ))
+        status = "created"
+    elif admin.login != app_settings.ADMIN_LOGIN:
+        admin.login = app_settings.ADMIN_LOGIN
+        status = "updated"
+    else:
+        return "unchanged"
+
+    await db.commit()
+    return status
+
+
+async def sync_admin_password_from_env(db: AsyncSession) -> str:
+    """
+    Verify ADMIN_PASSWORD against the admin's stored hash (one bcrypt call) and
+    rehash it when the password changed or the hashing policy is outdated.
+
+    Returns "updated" or "unchanged" (also when there is no admin).
+    """
+    result = await db.execute(select(User).where(User.role == UserRole.ADMIN))
+    admin = result.scalars().first()
+    if admin is None:
+        return "unchanged"
+
+    try:
+        password_matches, new_hash = await verify_and_update_password_async(
+            app_settings.ADMIN_PASSWORD, admin.password_hash
+        )
+    except ValueError:
+        # Unreadable hash: replace it
+        password_matches, new_hash = False, None
+    if not password_matches:
+        admin.password_hash = await get_password_hash_async(app_settings.ADMIN_PASSWORD)
+    elif new_hash is not None:
+        # Hashing policy changed (scheme or cost): upgrade the stored hash
+        admin.password_hash = new_hash
+    else:
+        return "unchanged"
+
+    await db.commit()
+    return "updated"
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the list read paths (list_students, list_all_specialties).
+
+Compares the previous ORM-entity implementation ("before") with the current
+column-select implementation used by the endpoints ("after") on a seeded
+database and prints rows/sec for each. Both variants include response
+validation/serialization the way FastAPI performs it for response_model.
+
+The database is seeded from scratch (tables are dropped and recreated), so
+never point it at a real database.
+
+Usage:
+    cd backend
+    python -m scripts.bench_list_reads
+    python -m scripts.bench_list_reads --database-url postgresql+asyncpg://u:p@localhost/bench --students 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.admin import list_all_specialties
+from app.api.operator import list_students
+from app.core.database import Base
+from app.models import SPO, Specialty, SpecialtyTemplate, Student, User, UserRole
+from app.schemas import SpecialtyWithStats, StudentWithSpecialty
+
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:////tmp/spo_bench_list_reads.db"
+
+
+async def seed(engine, students: int, spo_count: int, specialties_per_spo: int) -> None:
+    """Drop/create tables and insert SPOs, specialties and students with Core bulk inserts."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+        now = datetime(2026, 1, 1)
+        await conn.execute(insert(SPO), [
+            {"id": i, "name": f"СПО {i}", "created_at": now} for i in range(1, spo_count + 1)
+        ])
+        await conn.execute(insert(SpecialtyTemplate), [
+            {"id": i, "code": f"{i:02d}.02.01", "name": f"Специальность {i}", "created_at": now}
+            for i in range(1, specialties_per_spo + 1)
+        ])
+        specialty_rows = []
+        for spo_id in range(1, spo_count + 1):
+            for template_id in range(1, specialties_per_spo + 1):
+                specialty_rows.append({
+                    "id": len(specialty_rows) + 1,
+                    "spo_id": spo_id,
+                    "template_id": template_id,
+                    "code": f"{template_id:02d}.02.01",
+                    "name": f"Специальность {template_id}",
+                    "quota": students,
+                    "created_at": now,
+                })
+        await conn.execute(insert(Specialty), specialty_rows)
+
+        chunk = []
+        for i in range(students):
+            specialty = specialty_rows[i % len(specialty_rows)]
+            chunk.append({
+                "specialty_id": specialty["id"],
+                "spo_id": specialty["spo_id"],
+                "first_name": f"Имя{i}",
+                "last_name": f"Фамилия{i:06d}",
+                "middle_name": "Отчество" if i % 2 else None,
+                "certificate_number": f"{i:010d}",
+                "created_at": now + timedelta(seconds=i),
+            })
+            if len(chunk) == 5000:
+                await conn.execute(insert(Student), chunk)
+                chunk = []
+        if chunk:
+            await conn.execute(insert(Student), chunk)
+
+
+# ---- "before": ORM entity implementations as they were prior to the Core read layer ----
+
+async def list_students_orm(db: AsyncSession, spo_id: int, limit: int) -> List[StudentWithSpecialty]:
+    stmt = (
+        select(Student, Specialty.name.label("specialty_name"), SPO.name.label("spo_name"))
+        .join(Specialty, Student.specialty_id == Specialty.id)
+        .join(SPO, Student.spo_id == SPO.id)
+        .where(Student.spo_id == spo_id)
+        .order_by(Student.created_at, Student.id)
+        .limit(limit)
+    )
+    rows = (await db.execute(stmt)).all()
+    return [
+        StudentWithSpecialty(
+            id=student.id,
+            specialty_id=student.specialty_id,
+            first_name=student.first_name,
+            last_name=student.last_name,
+            middle_name=student.middle_name,
+            certificate_number=student.certificate_number,
+            created_at=student.created_at,
+            specialty_name=specialty_name,
+            spo_name=spo_name
+        )
+        for student, specialty_name, spo_name in rows
+    ]
+
+
+async def list_all_specialties_orm(db: AsyncSession) -> List[SpecialtyWithStats]:
+    students_count_subq = (
+        select(Student.specialty_id, func.count(Student.id).label("students_count"))
+        .group_by(Student.specialty_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            Specialty,
+            func.coalesce(students_count_subq.c.students_count, 0).label("students_count"),
+            SPO.name.label("spo_name")
+        )
+        .join(SPO, Specialty.spo_id == SPO.id)
+        .outerjoin(students_count_subq, Specialty.id == students_count_subq.c.specialty_id)
+    )
+    rows = (await db.execute(stmt)).all()
+    return [
+        SpecialtyWithStats(
+            id=specialty.id,
+            spo_id=specialty.spo_id,
+            template_id=specialty.template_id,
+            code=specialty.code,
+            name=specialty.name,
+            quota=specialty.quota,
+            created_at=specialty.created_at,
+            students_count=students_count,
+            available_slots=max(0, specialty.quota - students_count),
+            spo_name=spo_name
+        )
+        for specialty, students_count, spo_name in rows
+    ]
+
+
+def render(adapter: TypeAdapter, items: list) -> bytes:
+    """Mimic FastAPI response_model handling: dump models, validate, serialize."""
+    content = [item.model_dump() if hasattr(item, "model_dump") else item for item in items]
+    return adapter.dump_json(adapter.validate_python(content))
+
+
+async def measure(session_factory, label: str, call, adapter: TypeAdapter, repeat: int) -> None:
+    total_rows = 0
+    # Warm-up run (statement compilation cache, page cache)
+    async with session_factory() as db:
+        render(adapter, await call(db))
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        async with session_factory() as db:
+            items = await call(db)
+            render(adapter, items)
+            total_rows += len(items)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<8} {total_rows / elapsed:>12,.0f} rows/sec  ({elapsed / repeat * 1000:.1f} ms/call)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--spo", type=int, default=20)
+    parser.add_argument("--specialties-per-spo", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse an already seeded database")
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(engine, args.students, args.spo, args.specialties_per_spo)
+        print(f"Seeded {args.students:,} students in {time.perf_counter() - started:.1f}s")
+
+    operator = User(id=1, login="bench", role=UserRole.OPERATOR, spo_id=1)
+    admin = User(id=2, login="bench_admin", role=UserRole.ADMIN, spo_id=None)
+
+    students_adapter = TypeAdapter(List[StudentWithSpecialty])
+    specialties_adapter = TypeAdapter(List[SpecialtyWithStats])
+
+    print(f"\nlist_students (spo_id=1, limit={args.limit}, sort=created_at)")
+    await measure(
+        session_factory, "before",
+        lambda db: list_students_orm(db, operator.spo_id, args.limit),
+        students_adapter, args.repeat,
+    )
+    await measure(
+        session_factory, "after",
+        lambda db: list_students.__wrapped__(
+            specialty_id=None, sort="created_at", search=None, certificate_number=None,
+            created_from=None, created_to=None, skip=0, limit=args.limit,
+            db=db, current_user=operator,
+        ),
+        students_adapter, args.repeat,
+    )
+
+    print(f"\nlist_all_specialties ({args.spo * args.specialties_per_spo} rows)")
+    await measure(
+        session_factory, "before",
+        list_all_specialties_orm,
+        specialties_adapter, args.repeat,
+    )
+    await measure(
+        session_factory, "after",
+        lambda db: list_all_specialties.__wrapped__(spo_id=None, db=db, current_user=admin),
+        specialties_adapter, args.repeat,
+    )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
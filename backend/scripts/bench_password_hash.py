@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Pick the password hashing cost for this hardware.
+
+Measures how long one hash takes for increasing costs of the configured
+scheme (bcrypt rounds, or argon2 time_cost with the configured memory and
+parallelism) and recommends the highest cost whose median stays within the
+target login latency. Run it on the deployment hardware, e.g.:
+
+    docker compose exec backend python -m scripts.bench_password_hash --target-ms 250
+
+Existing hashes with a lower cost are upgraded on the next login once the new
+value is configured (BCRYPT_ROUNDS / ARGON2_TIME_COST).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.security import build_password_context
+
+
+def median_ms(context, samples: int) -> float:
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("benchmark-password")
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Acceptable time for one hash")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        setting, costs = "BCRYPT_ROUNDS", range(8, 18)
+        make_context = lambda cost: build_password_context("bcrypt", bcrypt_rounds=cost)
+    else:
+        setting, costs = "ARGON2_TIME_COST", range(1, 21)
+        make_context = lambda cost: build_password_context("argon2", argon2_time_cost=cost)
+        print(f"argon2 memory_cost={settings.ARGON2_MEMORY_COST} KiB, parallelism={settings.ARGON2_PARALLELISM}")
+
+    print(f"Target: {args.target_ms:.0f} ms per hash ({args.scheme}, median of {args.samples})")
+    chosen = None
+    for cost in costs:
+        elapsed = median_ms(make_context(cost), args.samples)
+        fits = elapsed <= args.target_ms
+        print(f"  {setting}={cost:<3} {elapsed:>9.1f} ms {'ok' if fits else ''}")
+        if fits:
+            chosen = cost
+        elif elapsed > args.target_ms * 2:
+            break
+
+    if chosen is None:
+        print("\nNo cost meets the target; use the lowest measured value and review the target.")
+    else:
+        print(f"\nRecommended: {setting}={chosen}")
+
+
+if __name__ == "__main__":
+    main()
@@ -149,3 +149,320 @@ async def test_assign_specialty_to_spo(client, admin_token, spo, template):
     data = response.json()
     assert data["spo_id"] == new_spo_id
     assert data["quota"] == 30
+
+
+# ---- Round trips: one statement for auth + RETURNING-based writes ----
+
+@pytest.mark.asyncio
+async def test_create_spo_query_count(client, admin_token, count_queries):
+    with count_queries() as statements:
+        response = await client.post("/api/admin/spo", json={
+            "name": "СПО"
+        }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_update_specialty_quota_query_count(client, admin_token, specialty, count_queries):
+    with count_queries() as statements:
+        response = await client.put(f"/api/admin/specialties/{specialty.id}/quota", json={
+            "quota": 10
+        }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_update_specialty_quota_not_found(client, admin_token):
+    response = await client.put("/api/admin/specialties/99999/quota", json={
+        "quota": 10
+    }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_specialty_template_query_count(client, admin_token, count_queries):
+    with count_queries() as statements:
+        response = await client.post("/api/admin/specialty-templates", json={
+            "code": "38.02.01",
+            "name": "Экономика"
+        }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_specialty_template_duplicate(client, admin_token, template):
+    response = await client.post("/api/admin/specialty-templates", json={
+        "code": template.code,
+        "name": "Дубликат"
+    }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_assign_specialty_query_count(client, admin_token, spo, template, count_queries):
+    with count_queries() as statements:
+        response = await client.post("/api/admin/specialties", json={
+            "template_id": template.id,
+            "spo_id": spo.id
+        }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    assert response.json()["quota"] == 25  # DEFAULT_BASE_QUOTA, no settings row
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_assign_specialty_duplicate(client, admin_token, specialty):
+    response = await client.post("/api/admin/specialties", json={
+        "template_id": specialty.template_id,
+        "spo_id": specialty.spo_id
+    }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_assign_specialty_missing_spo(client, admin_token, template):
+    response = await client.post("/api/admin/specialties", json={
+        "template_id": template.id,
+        "spo_id": 99999
+    }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Учреждение не найдено"
+
+
+@pytest.mark.asyncio
+async def test_create_operator_query_count(client, admin_token, spo, count_queries):
+    with count_queries() as statements:
+        response = await client.post("/api/admin/operators", json={
+            "spo_id": spo.id
+        }, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    # auth + SPO name + login uniqueness + INSERT ... RETURNING
+    assert len(statements) == 4
+
+
+@pytest.mark.asyncio
+async def test_create_operators_bulk(client, admin_token, spo, operator_user, count_queries):
+    # Two more SPOs without operators, one with the same name as the fixture SPO
+    for name in ("Тестовое СПО", "Колледж «Донской»"):
+        await client.post("/api/admin/spo", json={"name": name}, headers={
+            "Authorization": f"Bearer {admin_token}"
+        })
+
+    with count_queries() as statements:
+        response = await client.post("/api/admin/operators/bulk", headers={
+            "Authorization": f"Bearer {admin_token}"
+        })
+    assert response.status_code == 201
+    data = response.json()
+    assert data["skipped_spo_ids"] == []
+    assert sorted(c["login"] for c in data["created"]) == ["donskoy", "testovoe_spo"]
+    # SPO list + one login prefix query + one multi-row INSERT (principal already cached)
+    assert len(statements) == 3
+
+    # Nothing left to provision
+    response = await client.post("/api/admin/operators/bulk", headers={
+        "Authorization": f"Bearer {admin_token}"
+    })
+    assert response.json()["created"] == []
+
+
+@pytest.mark.asyncio
+async def test_create_operators_bulk_skips_concurrently_provisioned_spo(
+    client, db_session, admin_token, spo, monkeypatch
+):
+    from app.api import admin as admin_api
+    from app.core.security import get_password_hash
+    from app.models import User, UserRole
+
+    spo_id = spo.id  # the shared session is rolled back by the conflict, expiring spo
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/admin/spo", json={"name": "Колледж «Донской»"}, headers=headers)
+    other_spo_id = response.json()["id"]
+    real_provision = admin_api.provision_operators
+    calls = []
+
+    async def provision_after_concurrent_admin(db, spos):
+        if not calls:
+            # Another admin creates an operator for the fixture SPO meanwhile
+            db_session.add(User(
+                login="concurrent", password_hash=get_password_hash("x"), role=UserRole.OPERATOR, spo_id=spo_id
+            ))
+            await db_session.commit()
+        calls.append(spos)
+        return await real_provision(db, spos)
+
+    monkeypatch.setattr(admin_api, "provision_operators", provision_after_concurrent_admin)
+    response = await client.post("/api/admin/operators/bulk", headers=headers)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["skipped_spo_ids"] == [spo_id]
+    assert [c["spo_id"] for c in data["created"]] == [other_spo_id]
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_operators_bulk_conflict_returns_409(client, admin_token, spo, monkeypatch):
+    from sqlalchemy.exc import IntegrityError
+    from app.api import admin as admin_api
+
+    async def always_conflicts(db, spos):
+        raise IntegrityError("INSERT INTO users", {}, Exception("duplicate login"))
+
+    monkeypatch.setattr(admin_api, "provision_operators", always_conflicts)
+    response = await client.post("/api/admin/operators/bulk", headers={
+        "Authorization": f"Bearer {admin_token}"
+    })
+    assert response.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_cached_principal_skips_user_lookup(client, admin_token, count_queries):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert (await client.get("/api/admin/specialty-templates", headers=headers)).status_code == 200
+
+    with count_queries() as statements:
+        response = await client.get("/api/admin/specialty-templates", headers=headers)
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_delete_operator_invalidates_principal(client, admin_token, operator_user, operator_token):
+    operator_headers = {"Authorization": f"Bearer {operator_token}"}
+    assert (await client.get("/api/auth/me", headers=operator_headers)).status_code == 200
+
+    response = await client.delete(f"/api/admin/operators/{operator_user.id}", headers={
+        "Authorization": f"Bearer {admin_token}"
+    })
+    assert response.status_code == 204
+
+    response = await client.get("/api/auth/me", headers=operator_headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_delete_spo_invalidates_operator_principal(client, admin_token, spo, operator_user, operator_token):
+    operator_headers = {"Authorization": f"Bearer {operator_token}"}
+    assert (await client.get("/api/auth/me", headers=operator_headers)).status_code == 200
+
+    response = await client.delete(f"/api/admin/spo/{spo.id}", headers={
+        "Authorization": f"Bearer {admin_token}"
+    })
+    assert response.status_code == 204
+
+    response = await client.get("/api/auth/me", headers=operator_headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_reset_operator_password_revokes_refresh_tokens(client, admin_token, operator_user):
+    from app.services import issue_refresh_token
+
+    refresh_token = await issue_refresh_token(operator_user.id)
+    response = await client.post(f"/api/admin/operators/{operator_user.id}/reset-password", headers={
+        "Authorization": f"Bearer {admin_token}"
+    })
+    assert response.status_code == 200
+
+    response = await client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+
+@pytest.fixture()
+async def replica(monkeypatch):
+    """An empty second database standing in for a read replica."""
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.api import deps
+    from app.core.database import Base
+
+    replica_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(deps, "ReplicaSessionLocal", async_sessionmaker(replica_engine, expire_on_commit=False))
+    yield replica_engine
+    await replica_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica_until_own_write(client, admin_token, operator_token, spo, replica):
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    # Read-only endpoint is served by the (empty) replica
+    response = await client.get("/api/admin/spo", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+    response = await client.post("/api/admin/spo", json={"name": "Новое СПО"}, headers=admin_headers)
+    assert response.status_code == 201
+
+    # Read-your-writes: the admin now reads from the primary
+    response = await client.get("/api/admin/spo", headers=admin_headers)
+    assert sorted(s["name"] for s in response.json()) == ["Новое СПО", "Тестовое СПО"]
+
+    # Other users are not affected
+    response = await client.get("/api/specialties", headers={
+        "Authorization": f"Bearer {operator_token}"
+    })
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_profiled_admin_request_stores_report(client, admin_token, spo):
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = await client.get("/api/stats", headers={**admin_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert profile_id == response.headers["X-Request-ID"]
+
+    response = await client.get(f"/api/admin/profiles/{profile_id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(("text/html", "text/plain"))
+    assert response.text
+
+    # Without the flag nothing is profiled
+    response = await client.get("/api/stats", headers=admin_headers)
+    assert "X-Profile-Id" not in response.headers
+    response = await client.get(f"/api/admin/profiles/{response.headers['X-Request-ID']}", headers=admin_headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_profiler_start_failure_does_not_disable_profiling(client, admin_token, spo, monkeypatch):
+    from app.core import profiling
+
+    def fail_to_start(self):
+        raise RuntimeError("a profiler is already active in this thread")
+
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    with monkeypatch.context() as patch:
+        patch.setattr(profiling._RequestProfiler, "start", fail_to_start)
+        response = await client.get("/api/stats?profile=1", headers=admin_headers)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert profiling._profiling_active is False
+
+    response = await client.get("/api/stats?profile=1", headers=admin_headers)
+    assert "X-Profile-Id" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_operator_cannot_profile_requests(client, operator_token, admin_token):
+    response = await client.get("/api/stats?profile=1", headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+    response = await client.get(
+        f"/api/admin/profiles/{response.headers['X-Request-ID']}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 404
+
+    response = await client.get(
+        "/api/admin/profiles/anything", headers={"Authorization": f"Bearer {operator_token}"}
+    )
+    assert response.status_code == 403
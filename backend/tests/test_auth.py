@@ -70,3 +70,228 @@ async def test_me_invalid_token(client):
 async def test_me_no_token(client):
     response = await client.get("/api/auth/me")
     assert response.status_code in (401, 403)
+
+
+@pytest.mark.asyncio
+async def test_login_records_hashing_metrics(client, admin_user):
+    from app.core.metrics import REGISTRY
+    from app.core.security import get_hashing_stats
+
+    completed_before = get_hashing_stats()["completed"]
+    hashed_before = REGISTRY.get_sample_value("password_hash_duration_seconds_count") or 0.0
+    queued_before = REGISTRY.get_sample_value("password_hash_queue_seconds_count") or 0.0
+    response = await client.post("/api/auth/login", json={
+        "login": "admin_test",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    stats = get_hashing_stats()
+    assert stats["completed"] == completed_before + 1
+    assert stats["in_flight"] == 0
+    assert stats["hash_seconds_max"] > 0
+    assert REGISTRY.get_sample_value("password_hash_duration_seconds_count") == hashed_before + 1
+    assert REGISTRY.get_sample_value("password_hash_queue_seconds_count") == queued_before + 1
+
+
+@pytest.mark.asyncio
+async def test_login_sheds_load_when_hashing_saturated(client, admin_user, monkeypatch):
+    from app.core.config import settings
+    from app.core.metrics import REGISTRY
+
+    rejected_before = REGISTRY.get_sample_value("password_hash_rejected_total") or 0.0
+    # No capacity at all: every hashing call is rejected
+    monkeypatch.setattr(settings, "PASSWORD_HASH_CONCURRENCY", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 0)
+    response = await client.post("/api/auth/login", json={
+        "login": "admin_test",
+        "password": "admin123"
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert REGISTRY.get_sample_value("password_hash_rejected_total") == rejected_before + 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_hashing_call_keeps_its_slot_until_the_thread_finishes():
+    import asyncio
+    import threading
+    from app.core import security
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+
+    in_flight_before = security.get_hashing_stats()["in_flight"]
+    task = asyncio.create_task(security._run_hashing(slow_hash))
+    assert await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The request is gone but bcrypt still runs in the executor thread
+    assert security.get_hashing_stats()["in_flight"] == in_flight_before + 1
+    release.set()
+    for _ in range(100):
+        if security.get_hashing_stats()["in_flight"] == in_flight_before:
+            break
+        await asyncio.sleep(0.01)
+    assert security.get_hashing_stats()["in_flight"] == in_flight_before
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_releases_connection(db_session, admin_user, admin_token, count_queries):
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.api.deps import get_current_user
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=admin_token)
+
+    # Cache miss: one lookup, then the transaction is closed and the connection released
+    user = await get_current_user(credentials=credentials, db=db_session)
+    assert user.id == admin_user.id
+    assert not db_session.in_transaction()
+
+    # Cache hit: resolved without touching the session at all
+    with count_queries() as statements:
+        user = await get_current_user(credentials=credentials, db=db_session)
+    assert user.login == "admin_test"
+    assert statements == []
+    assert not db_session.in_transaction()
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited(client, admin_user):
+    for _ in range(5):
+        response = await client.post("/api/auth/login", json={
+            "login": "admin_test",
+            "password": "wrong"
+        })
+        assert response.status_code == 401
+
+    response = await client.post("/api/auth/login", json={
+        "login": "admin_test",
+        "password": "admin123"
+    })
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+
+def test_sliding_window_limiter_local_fallback():
+    from app.core.rate_limit import SlidingWindowLimiter
+
+    limiter = SlidingWindowLimiter("test", limit=2, window_seconds=10)
+    assert limiter._hit_local("a", 100.0) is None
+    assert limiter._hit_local("a", 101.0) is None
+    assert limiter._hit_local("a", 102.0) == pytest.approx(8.0)
+    assert limiter._hit_local("b", 102.0) is None
+    # First hit left the window
+    assert limiter._hit_local("a", 110.5) is None
+
+
+def test_sliding_window_limiter_evicts_stale_keys():
+    from app.core.rate_limit import SlidingWindowLimiter
+
+    limiter = SlidingWindowLimiter("test", limit=1, window_seconds=10)
+    for i in range(100):
+        limiter._hit_local(f"ip{i}", 0.0)
+    limiter._hit_local("fresh", 50.0)
+    assert list(limiter._local) == ["fresh"]
+
+
+def test_decode_access_token_matches_jose():
+    from datetime import timedelta
+    from jose import jwt
+    from app.core.config import settings
+    from app.core.security import _decode_hs256, create_access_token
+
+    token = create_access_token(data={"sub": "42"}, expires_delta=timedelta(minutes=5))
+    assert _decode_hs256(token) == jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+
+
+def test_decode_access_token_rejects_tampered_and_expired():
+    from datetime import timedelta
+    from jose import jwt
+    from app.core.security import create_access_token, decode_access_token
+
+    token = create_access_token(data={"sub": "42"})
+    header, payload, signature = token.split(".")
+    forged = jwt.encode({"sub": "1", "exp": 9999999999}, "other-secret", algorithm="HS256")
+    assert decode_access_token(f"{header}.{forged.split('.')[1]}.{signature}") is None
+    assert decode_access_token(forged) is None
+    assert decode_access_token("not-a-token") is None
+
+    expired = create_access_token(data={"sub": "42"}, expires_delta=timedelta(seconds=-1))
+    assert decode_access_token(expired) is None
+
+
+def test_decode_access_token_cache(monkeypatch):
+    from app.core import security
+
+    token = security.create_access_token(data={"sub": "7"})
+    assert security.decode_access_token(token)["sub"] == "7"
+
+    # Served from the cache without verifying again; callers get their own copy
+    monkeypatch.setattr(security, "_decode_verified", lambda _: pytest.fail("token verified twice"))
+    payload = security.decode_access_token(token)
+    payload["sub"] = "changed"
+    assert security.decode_access_token(token)["sub"] == "7"
+
+    # Expired entries are dropped on access
+    digest = next(d for d, claims in security._token_cache.items() if claims["sub"] == "7")
+    security._token_cache[digest] = {**security._token_cache[digest], "exp": 0}
+    assert security.decode_access_token(token) is None
+    assert digest not in security._token_cache
+
+
+async def _login_admin(client) -> dict:
+    response = await client.post("/api/auth/login", json={
+        "login": "admin_test",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_tokens(client, admin_user):
+    tokens = await _login_admin(client)
+
+    response = await client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+
+    response = await client.get("/api/auth/me", headers={
+        "Authorization": f"Bearer {rotated['access_token']}"
+    })
+    assert response.status_code == 200
+    assert response.json()["login"] == "admin_test"
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_all_sessions(client, admin_user):
+    tokens = await _login_admin(client)
+    rotated = (await client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})).json()
+
+    # Replaying the consumed token fails and kills the rotated one too
+    response = await client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    response = await client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(client, admin_user):
+    tokens = await _login_admin(client)
+
+    response = await client.post("/api/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+    response = await client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_unknown_token(client):
+    response = await client.post("/api/auth/refresh", json={"refresh_token": "unknown"})
+    assert response.status_code == 401
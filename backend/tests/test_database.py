@@ -0,0 +1,126 @@
+"""
+Tests for engine configuration and pool statistics.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.database import InstrumentedQueuePool, create_engine_from_settings, engine_options, pool_stats
+
+
+def test_engine_options_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 2)
+    monkeypatch.setattr(settings, "DB_POOL_RECYCLE", 600)
+
+    url, options = engine_options("postgresql+asyncpg://u:p@localhost/db")
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (5, 2, 600)
+    assert options["connect_args"]["statement_cache_size"] == settings.DB_STATEMENT_CACHE_SIZE
+    assert url.query["prepared_statement_cache_size"] == str(settings.DB_STATEMENT_CACHE_SIZE)
+
+
+def test_engine_options_pgbouncer(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 0)
+
+    url, options = engine_options("postgresql+asyncpg://u:p@localhost/db")
+    assert options["poolclass"] is NullPool
+    assert url.query["prepared_statement_cache_size"] == "0"
+    assert options["connect_args"]["statement_cache_size"] == 0
+    name_func = options["connect_args"]["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(tmp_path):
+    engine = create_engine_from_settings(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            stats = pool_stats(engine)
+            assert stats["checked_out"] == 1
+            assert stats["utilization"] == pytest.approx(1 / (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW), abs=1e-3)
+
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 0
+        assert stats["wait_seconds_max"] >= 0
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_health_does_not_expose_pool_stats(client):
+    # /health is proxied publicly by nginx; pool numbers are only on the internal /metrics
+    response = await client.get("/health")
+    assert set(response.json()) == {"status", "checks"}
+
+
+def test_normalize_statement():
+    from app.core.sql_instrumentation import normalize_statement
+
+    assert normalize_statement(
+        "SELECT students.id\n  FROM students WHERE students.id IN (?, ?, ?) AND name = 'x' LIMIT 10"
+    ) == "SELECT students.id FROM students WHERE students.id IN (...) AND name = ? LIMIT ?"
+    assert normalize_statement("SELECT * FROM t WHERE a = $1 AND b IN ($2, $3)") == (
+        "SELECT * FROM t WHERE a = $1 AND b IN (...)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(client, admin_token, spo):
+    response = await client.get("/api/admin/spo", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    server_timing = response.headers["Server-Timing"]
+    assert server_timing.startswith("db;dur=")
+    assert "queries" in server_timing and "app;dur=" in server_timing
+
+
+@pytest.mark.asyncio
+async def test_query_budget_warning(client, admin_token, spo, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET", 1)
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    with caplog.at_level("WARNING", logger="app.core.middleware"):
+        response = await client.get(f"/api/admin/spo/{spo.id}", headers=headers)
+    assert response.status_code == 200
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("Query budget exceeded" in m and "GET /api/admin/spo/{spo_id}" in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_repeated_statement_warning(engine, monkeypatch, caplog):
+    from fastapi import FastAPI
+    from httpx import AsyncClient, ASGITransport
+    from app.core.middleware import RequestStatsMiddleware
+
+    monkeypatch.setattr(settings, "SQL_REPEATED_QUERY_THRESHOLD", 3)
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        # One query per item: the classic N+1 shape
+        async with engine.connect() as conn:
+            for item_id in range(3):
+                await conn.execute(text("SELECT :id"), {"id": item_id})
+        return []
+
+    app.add_middleware(RequestStatsMiddleware)
+    with caplog.at_level("WARNING", logger="app.core.middleware"):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/items")
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+    assert any("Possible N+1: statement executed 3 times" in r.getMessage() for r in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_slow_query_log(client, admin_token, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level("WARNING", logger="app.sql.slow"):
+        await client.get("/api/admin/specialty-templates", headers={"Authorization": f"Bearer {admin_token}"})
+    assert any(
+        record.name == "app.sql.slow" and "request_id=" in record.getMessage() for record in caplog.records
+    )
@@ -0,0 +1,75 @@
+"""
+Tests for the queue-based JSON logging pipeline.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+from app.core.logging_config import JsonFormatter, RequestContextFilter, _QueueHandler
+from app.core.request_context import RequestContext, reset_request_context, set_request_context
+
+
+def _record(msg, *args, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord("app.test", logging.WARNING, __file__, 1, msg, args, exc_info)
+
+
+def test_json_formatter_escapes_message():
+    line = JsonFormatter().format(_record('Login "%s" failed\nnext line', 'ad"min'))
+    entry = json.loads(line)
+    assert entry["message"] == 'Login "ad"min" failed\nnext line'
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == "app.test"
+    assert "request_id" not in entry
+
+
+def test_request_fields_are_attached():
+    context = RequestContext(request_id="req-1", method="GET", path="/api/stats", user_id=7, role="admin")
+    token = set_request_context(context)
+    try:
+        record = _record("handled")
+        RequestContextFilter().filter(record)
+    finally:
+        reset_request_context(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["request_id"] == "req-1"
+    assert entry["user_id"] == 7
+    assert entry["role"] == "admin"
+    assert entry["route"] == "/api/stats"
+
+
+def test_records_are_written_by_listener_thread():
+    written = []
+
+    class _Collect(logging.Handler):
+        def emit(self, record):
+            written.append((threading.current_thread(), self.format(record)))
+
+    collector = _Collect()
+    collector.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, collector)
+    listener.start()
+
+    logger = logging.getLogger("app.test.queue")
+    logger.propagate = False
+    handler = _QueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        logger.debug("filtered out %s", object())
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Failed for %s", "spo 1")
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    assert len(written) == 1
+    thread, line = written[0]
+    assert thread is not threading.current_thread()
+    entry = json.loads(line)
+    assert entry["message"] == "Failed for spo 1"
+    assert "ValueError: boom" in entry["exception"]
@@ -0,0 +1,341 @@
+"""
+Tests for request IDs, compression, rate limiting / load shedding, metrics middleware
+and the event-loop monitor.
+"""
+import asyncio
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from app.core import metrics
+from app.core.loop_monitor import LoopMonitor
+from app.core.middleware import CompressionMiddleware, MetricsMiddleware, RateLimitMiddleware, RequestIdMiddleware
+from app.core.security import create_access_token
+
+
+def _make_app(**limits) -> tuple[FastAPI, asyncio.Event]:
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/api/items")
+    async def items():
+        return []
+
+    @app.post("/api/export")
+    async def export():
+        return {}
+
+    @app.get("/api/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @app.get("/health")
+    async def health():
+        return {}
+
+    app.add_middleware(RateLimitMiddleware, **limits)
+    return app, release
+
+
+@pytest.mark.asyncio
+async def test_user_bucket_returns_429_with_retry_after():
+    app, _ = _make_app(per_second=1, burst=2, routes={}, max_concurrent=0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/api/items")).status_code == 200
+        assert (await client.get("/api/items")).status_code == 200
+        response = await client.get("/api/items")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        # Health checks are never limited
+        assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_user():
+    app, _ = _make_app(per_second=1, burst=1, routes={}, max_concurrent=0)
+    first = {"Authorization": f"Bearer {create_access_token(data={'sub': '1'})}"}
+    second = {"Authorization": f"Bearer {create_access_token(data={'sub': '2'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/api/items", headers=first)).status_code == 200
+        assert (await client.get("/api/items", headers=first)).status_code == 429
+        assert (await client.get("/api/items", headers=second)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_route_rule_is_stricter_than_user_bucket():
+    app, _ = _make_app(per_second=100, burst=100, routes={"POST /api/export": [0.1, 1]}, max_concurrent=0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/api/export")).status_code == 200
+        response = await client.post("/api/export")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "10"
+        # Other routes still use the user bucket
+        assert (await client.get("/api/items")).status_code == 200
+
+
+def test_default_route_rules_match_real_routes():
+    """Every default RATE_LIMIT_ROUTES rule must cover at least one route of the app."""
+    from app.core.config import settings
+    from app.main import app
+
+    routes = [(method, route.path) for route in app.routes for method in getattr(route, "methods", None) or ()]
+    for rule in settings.RATE_LIMIT_ROUTES:
+        method, _, prefix = rule.partition(" ")
+        assert any(m == method and path.startswith(prefix) for m, path in routes), f"{rule} matches no route"
+
+
+@pytest.mark.asyncio
+async def test_default_batch_rule_limits_student_batch(client, operator_token):
+    headers = {"Authorization": f"Bearer {operator_token}"}
+    statuses = [
+        (await client.post("/api/students/batch", json={}, headers=headers)).status_code
+        for _ in range(6)
+    ]
+    # The first five pass the limiter (an empty batch is then rejected by validation)
+    assert 429 not in statuses[:5]
+    assert statuses[5] == 429
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_sheds_with_503():
+    app, release = _make_app(per_second=100, burst=100, routes={}, max_concurrent=1)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        slow = asyncio.create_task(client.get("/api/slow"))
+        await asyncio.sleep(0.05)
+        response = await client.get("/api/items")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        release.set()
+        assert (await slow).status_code == 200
+        assert (await client.get("/api/items")).status_code == 200
+
+
+def _sample(name: str, **labels) -> float:
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_template_and_status():
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: int):
+        return {}
+
+    app.add_middleware(MetricsMiddleware)
+    labels = {"method": "GET", "route": "/api/items/{item_id}"}
+    before_ok = _sample("http_requests_total", status="200", **labels)
+    before_invalid = _sample("http_requests_total", status="422", **labels)
+    before_unmatched = _sample("http_requests_total", method="GET", route="unmatched", status="404")
+    before_latency = _sample("http_request_duration_seconds_count", **labels)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/api/items/1")
+        await client.get("/api/items/2")
+        await client.get("/api/items/abc")
+        await client.get("/nowhere")
+
+    assert _sample("http_requests_total", status="200", **labels) == before_ok + 2
+    assert _sample("http_requests_total", status="422", **labels) == before_invalid + 1
+    assert _sample("http_requests_total", method="GET", route="unmatched", status="404") == before_unmatched + 1
+    assert _sample("http_request_duration_seconds_count", **labels) == before_latency + 3
+    assert _sample("http_requests_in_progress") == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_runtime_metrics(client, admin_token):
+    metrics.sample_runtime_metrics()
+
+    response = await client.get("/api/stats", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/stats",status="200"}' in body
+    assert "password_hash_in_flight 0.0" in body
+    assert "password_hash_rejected_total" in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_hashing_latency(client, admin_user):
+    response = await client.post("/api/auth/login", json={"login": "admin_test", "password": "admin123"})
+    assert response.status_code == 200
+
+    body = (await client.get("/metrics")).text
+    for name in ("password_hash_duration_seconds", "password_hash_queue_seconds"):
+        count = next(line for line in body.splitlines() if line.startswith(f"{name}_count "))
+        assert float(count.split()[1]) >= 1
+        assert f'{name}_bucket{{le="+Inf"}}' in body
+    assert "event_loop_lag_seconds" in body
+    assert "cache_requests_total" in body
+
+
+def test_pool_checkout_timeouts_are_counted_once(monkeypatch):
+    from app.core import database
+
+    pool = {"pooled": True, "checked_out": 0, "idle": 1, "overflow": 0, "timeouts": 2}
+    monkeypatch.setattr(database, "get_pool_stats", lambda: {"test_engine": pool})
+    before = _sample("db_pool_checkout_timeouts_total", engine="test_engine")
+
+    metrics.sample_runtime_metrics()
+    metrics.sample_runtime_metrics()
+    assert _sample("db_pool_checkout_timeouts_total", engine="test_engine") == before + 2
+
+    pool["timeouts"] = 5
+    metrics.sample_runtime_metrics()
+    assert _sample("db_pool_checkout_timeouts_total", engine="test_engine") == before + 5
+
+
+def _block_event_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_blocking_call_with_stack(caplog):
+    monitor = LoopMonitor(threshold_seconds=0.05)
+    monitor.start()
+    blocks_before = _sample("event_loop_blocked_total")
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+            _block_event_loop(0.3)
+            await asyncio.sleep(0.1)
+    finally:
+        await monitor.stop()
+
+    blocked = [r.getMessage() for r in caplog.records if "Event loop blocked" in r.getMessage()]
+    assert len(blocked) == 1
+    assert "_block_event_loop" in blocked[0]
+    assert _sample("event_loop_blocked_total") == blocks_before + 1
+    assert _sample("event_loop_lag_seconds_count") > 0
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_is_quiet_without_stalls(caplog):
+    monitor = LoopMonitor(threshold_seconds=0.05)
+    monitor.start()
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+            await asyncio.sleep(0.2)
+    finally:
+        await monitor.stop()
+
+    assert not [r for r in caplog.records if "Event loop blocked" in r.getMessage()]
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_propagated_and_sanitized():
+    app = FastAPI()
+
+    @app.get("/api/echo")
+    async def echo(request: Request):
+        return {"request_id": request.state.request_id}
+
+    @app.get("/api/download")
+    async def download():
+        async def chunks():
+            for part in (b"first ", b"second"):
+                yield part
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    app.add_middleware(RequestIdMiddleware)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/echo", headers={"X-Request-ID": "trace-42"})
+        assert response.headers["X-Request-ID"] == "trace-42"
+        assert response.json() == {"request_id": "trace-42"}
+
+        response = await client.get("/api/echo", headers={"X-Request-ID": "bad id\twith spaces"})
+        assert response.headers["X-Request-ID"] != "bad id\twith spaces"
+        assert response.json()["request_id"] == response.headers["X-Request-ID"]
+
+        response = await client.get("/api/download")
+        assert response.content == b"first second"
+        assert response.headers["X-Request-ID"]
+
+
+def _make_compression_app() -> FastAPI:
+    app = FastAPI()
+    rows = [{"id": i, "last_name": "Петров", "first_name": "Иван"} for i in range(200)]
+
+    @app.get("/api/students")
+    async def students():
+        return rows
+
+    @app.get("/api/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/docx")
+    async def docx():
+        async def chunks():
+            yield b"PK" + b"\x00" * 4000
+        return StreamingResponse(
+            chunks(), media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+
+    @app.get("/api/precompressed")
+    async def precompressed():
+        return Response(b"x" * 4000, media_type="application/json", headers={"Content-Encoding": "identity"})
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"line {i} ".encode() * 200
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500, brotli_quality=4)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_compression_applies_to_large_json_and_text_streams():
+    app = _make_compression_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        gzip_only = {"Accept-Encoding": "gzip"}
+        response = await client.get("/api/students", headers=gzip_only)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert int(response.headers["Content-Length"]) < len(response.content)
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert len(response.json()) == 200
+
+        response = await client.get("/api/stream", headers=gzip_only)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.text == "".join(f"line {i} " * 200 for i in range(3))
+
+        response = await client.get("/api/students", headers={"Accept-Encoding": "gzip;q=0"})
+        assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_compression_skips_small_binary_and_encoded_bodies():
+    app = _make_compression_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = {"Accept-Encoding": "gzip, br"}
+        response = await client.get("/api/small", headers=headers)
+        assert "Content-Encoding" not in response.headers
+        assert response.json() == {"ok": True}
+
+        response = await client.get("/api/docx", headers=headers)
+        assert "Content-Encoding" not in response.headers
+        assert response.content.startswith(b"PK")
+
+        response = await client.get("/api/precompressed", headers=headers)
+        assert response.headers["Content-Encoding"] == "identity"
+
+
+@pytest.mark.asyncio
+async def test_brotli_preferred_when_available():
+    pytest.importorskip("brotli")
+    app = _make_compression_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/students", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert len(response.json()) == 200
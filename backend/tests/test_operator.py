@@ -159,3 +159,200 @@ async def test_create_student_quota_exceeded(client, db_session, operator_token,
     }, headers={"Authorization": f"Bearer {operator_token}"})
     assert response.status_code == 400
     assert "Quota exceeded" in response.json()["detail"]
+
+
+async def _second_specialty(db_session, spo, quota=25):
+    from app.models import Specialty, SpecialtyTemplate
+    t = SpecialtyTemplate(code="38.02.01", name="Экономика")
+    db_session.add(t)
+    await db_session.flush()
+    s = Specialty(spo_id=spo.id, template_id=t.id, code=t.code, name=t.name, quota=quota)
+    db_session.add(s)
+    await db_session.commit()
+    await db_session.refresh(s)
+    return s
+
+
+@pytest.mark.asyncio
+async def test_batch_move_and_delete(client, db_session, operator_token, spo, specialty, student):
+    from app.models import Student as StudentModel
+    other = await _second_specialty(db_session, spo)
+    extra = StudentModel(
+        specialty_id=specialty.id, spo_id=spo.id, first_name="Олег", last_name="Сидоров",
+        certificate_number="5555555555",
+    )
+    db_session.add(extra)
+    await db_session.commit()
+
+    response = await client.post("/api/students/batch", json={
+        "moves": [{"student_id": student.id, "specialty_id": other.id}],
+        "delete_ids": [extra.id]
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 200
+    assert response.json() == {"moved": 1, "deleted": 1}
+
+    response = await client.get(f"/api/students?specialty_id={other.id}", headers={
+        "Authorization": f"Bearer {operator_token}"
+    })
+    assert [s["id"] for s in response.json()] == [student.id]
+
+
+@pytest.mark.asyncio
+async def test_batch_quota_exceeded_applies_nothing(client, db_session, operator_token, spo, specialty, student):
+    other = await _second_specialty(db_session, spo, quota=0)
+
+    response = await client.post("/api/students/batch", json={
+        "moves": [{"student_id": student.id, "specialty_id": other.id}]
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 400
+    assert "Quota exceeded" in response.json()["detail"]
+
+    response = await client.get(f"/api/students?specialty_id={specialty.id}", headers={
+        "Authorization": f"Bearer {operator_token}"
+    })
+    assert len(response.json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_duplicate_student(client, operator_token, specialty, student):
+    response = await client.post("/api/students/batch", json={
+        "moves": [{"student_id": student.id, "specialty_id": specialty.id}],
+        "delete_ids": [student.id]
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_unknown_student(client, operator_token, specialty):
+    response = await client.post("/api/students/batch", json={
+        "delete_ids": [99999]
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_update_student_move_keeps_spo_id(client, db_session, operator_token, spo, student):
+    from app.models import Student as StudentModel
+    other = await _second_specialty(db_session, spo)
+
+    response = await client.put(f"/api/students/{student.id}", json={
+        "specialty_id": other.id
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 200
+    assert response.json()["specialty_id"] == other.id
+
+    refreshed = await db_session.get(StudentModel, student.id)
+    assert refreshed.spo_id == spo.id
+
+
+@pytest.mark.asyncio
+async def test_update_missing_student_into_full_specialty(client, db_session, operator_token, spo, student):
+    # Unknown student is reported before the target specialty's quota is looked at
+    full = await _second_specialty(db_session, spo, quota=0)
+    response = await client.put("/api/students/99999", json={
+        "specialty_id": full.id
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 404
+    assert "Student not found" in response.json()["detail"]
+
+    response = await client.put(f"/api/students/{student.id}", json={
+        "specialty_id": full.id
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 400
+
+
+async def _add_students(db_session, specialty, rows):
+    from app.models import Student as StudentModel
+    for last_name, first_name, certificate in rows:
+        db_session.add(StudentModel(
+            specialty_id=specialty.id, spo_id=specialty.spo_id,
+            first_name=first_name, last_name=last_name, certificate_number=certificate,
+        ))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_list_students_sorting(client, db_session, operator_token, specialty):
+    await _add_students(db_session, specialty, [
+        ("Borisov", "Ivan", "300"),
+        ("Antonov", "Petr", "200"),
+        ("Vasiliev", "Oleg", "100"),
+    ])
+    headers = {"Authorization": f"Bearer {operator_token}"}
+
+    response = await client.get("/api/students?sort=name", headers=headers)
+    assert [s["last_name"] for s in response.json()] == ["Antonov", "Borisov", "Vasiliev"]
+
+    response = await client.get("/api/students?sort=-certificate", headers=headers)
+    assert [s["certificate_number"] for s in response.json()] == ["300", "200", "100"]
+
+    response = await client.get("/api/students?sort=name&skip=1&limit=1", headers=headers)
+    assert [s["last_name"] for s in response.json()] == ["Borisov"]
+
+
+@pytest.mark.asyncio
+async def test_list_students_filters(client, db_session, operator_token, specialty):
+    await _add_students(db_session, specialty, [
+        ("Borisov", "Ivan", "300"),
+        ("Bogdanov", "Petr", "200"),
+        ("Vasiliev", "Oleg", "100"),
+    ])
+    headers = {"Authorization": f"Bearer {operator_token}"}
+
+    response = await client.get("/api/students?search=bo&sort=name", headers=headers)
+    assert [s["last_name"] for s in response.json()] == ["Bogdanov", "Borisov"]
+
+    response = await client.get("/api/students?certificate_number=100", headers=headers)
+    assert [s["last_name"] for s in response.json()] == ["Vasiliev"]
+
+
+@pytest.mark.asyncio
+async def test_list_students_invalid_sort(client, operator_token):
+    response = await client.get("/api/students?sort=password", headers={
+        "Authorization": f"Bearer {operator_token}"
+    })
+    assert response.status_code == 422
+
+
+# ---- Round trips: one statement for auth + RETURNING-based writes ----
+
+@pytest.mark.asyncio
+async def test_create_student_query_count(client, operator_token, specialty, count_queries):
+    with count_queries() as statements:
+        response = await client.post("/api/students", json={
+            "specialty_id": specialty.id,
+            "first_name": "Анна",
+            "last_name": "Иванова",
+            "certificate_number": "9876543210"
+        }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 201
+    # auth + specialty lock + quota count + INSERT ... RETURNING
+    assert len(statements) == 4
+
+
+@pytest.mark.asyncio
+async def test_update_student_query_count(client, operator_token, student, count_queries):
+    with count_queries() as statements:
+        response = await client.put(f"/api/students/{student.id}", json={
+            "first_name": "Пётр"
+        }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 200
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_update_student_duplicate_certificate(client, db_session, operator_token, specialty, student):
+    await _add_students(db_session, specialty, [("Borisov", "Ivan", "300")])
+    response = await client.put(f"/api/students/{student.id}", json={
+        "certificate_number": "300"
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 400
+    assert "аттестата" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_update_student_not_found(client, operator_token, specialty):
+    response = await client.put("/api/students/99999", json={
+        "first_name": "Пётр"
+    }, headers={"Authorization": f"Bearer {operator_token}"})
+    assert response.status_code == 404
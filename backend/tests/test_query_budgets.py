@@ -0,0 +1,182 @@
+"""
+Query budgets: the number of SQL statements each endpoint may execute.
+
+Every endpoint of the admin, operator and stats routers is called once against
+a database holding several SPOs, specialties and students, so a per-row query
+(N+1) pushes the count over the budget. Counts include authentication (the
+principal cache is cleared before each request).
+
+When a change legitimately needs more queries, raise the budget in the same
+change and say why in the review.
+"""
+import pytest
+
+from app.core.security import create_access_token, get_password_hash
+from app.models import User, UserRole, SPO, SpecialtyTemplate, Specialty, Student
+
+EXTRA_SPO_COUNT = 3
+SPECIALTIES_PER_SPO = 2
+STUDENTS_PER_SPECIALTY = 2
+
+
+@pytest.fixture()
+async def populated(db_session, admin_user, operator_user, spo, template, specialty, student):
+    """Several SPOs with specialties and students around the standard fixtures."""
+    templates = [
+        SpecialtyTemplate(code=f"10.0{i}.01", name=f"Шаблон {i}")
+        for i in range(SPECIALTIES_PER_SPO + 1)
+    ]
+    extra_spos = [SPO(name=f"СПО {i}") for i in range(EXTRA_SPO_COUNT)]
+    db_session.add_all(templates + extra_spos)
+    await db_session.flush()
+
+    certificate = 1000000000
+    for extra_spo in extra_spos:
+        for tmpl in templates[:SPECIALTIES_PER_SPO]:
+            extra_specialty = Specialty(
+                spo_id=extra_spo.id, template_id=tmpl.id, code=tmpl.code, name=tmpl.name, quota=10
+            )
+            db_session.add(extra_specialty)
+            await db_session.flush()
+            for _ in range(STUDENTS_PER_SPECIALTY):
+                certificate += 1
+                db_session.add(Student(
+                    specialty_id=extra_specialty.id,
+                    spo_id=extra_spo.id,
+                    first_name="Анна",
+                    last_name="Смирнова",
+                    certificate_number=str(certificate),
+                ))
+
+    second_student = Student(
+        specialty_id=specialty.id,
+        spo_id=spo.id,
+        first_name="Мария",
+        last_name="Иванова",
+        certificate_number="5555555555",
+    )
+    extra_operator = User(
+        login="operator_extra",
+        password_hash=get_password_hash("operator123"),
+        role=UserRole.OPERATOR,
+        spo_id=extra_spos[0].id,
+    )
+    db_session.add_all([second_student, extra_operator])
+    await db_session.commit()
+
+    return {
+        "spo_id": spo.id,
+        "free_spo_id": extra_spos[1].id,
+        "specialty_id": specialty.id,
+        "template_id": template.id,
+        "unused_template_id": templates[-1].id,
+        "student_id": student.id,
+        "second_student_id": second_student.id,
+        "operator_id": extra_operator.id,
+        "request_id": "not-profiled",
+        "admin": create_access_token(data={"sub": str(admin_user.id)}),
+        "operator": create_access_token(data={"sub": str(operator_user.id)}),
+    }
+
+
+# (method, url, role, json body, expected status, budget)
+ADMIN_BUDGETS = [
+    ("GET", "/api/admin/spo", "admin", None, 200, 2),
+    ("POST", "/api/admin/spo", "admin", {"name": "Новое СПО"}, 201, 2),
+    ("GET", "/api/admin/spo/{spo_id}", "admin", None, 200, 5),
+    ("PUT", "/api/admin/spo/{spo_id}", "admin", {"name": "Переименованное СПО"}, 200, 4),
+    ("DELETE", "/api/admin/spo/{spo_id}", "admin", None, 204, 4),
+    ("GET", "/api/admin/operators", "admin", None, 200, 2),
+    ("POST", "/api/admin/operators", "admin", {"spo_id": "{free_spo_id}"}, 201, 4),
+    ("POST", "/api/admin/operators/bulk", "admin", None, 201, 4),
+    ("POST", "/api/admin/operators/export-docx", "admin",
+     {"items": [{"spo_name": "СПО", "login": "op", "password": "secret"}]}, 200, 1),
+    ("DELETE", "/api/admin/operators/{operator_id}", "admin", None, 204, 3),
+    ("POST", "/api/admin/operators/{operator_id}/reset-password", "admin", None, 200, 5),
+    ("PUT", "/api/admin/specialties/{specialty_id}/quota", "admin", {"quota": 30}, 200, 2),
+    ("GET", "/api/admin/settings", "admin", None, 200, 2),
+    ("PUT", "/api/admin/settings", "admin", {"base_quota": 30}, 200, 3),
+    ("GET", "/api/admin/specialty-templates", "admin", None, 200, 3),
+    ("POST", "/api/admin/specialty-templates", "admin", {"code": "54.02.01", "name": "Дизайн"}, 201, 2),
+    ("PUT", "/api/admin/specialty-templates/{template_id}", "admin", {"name": "Новое название"}, 200, 5),
+    ("DELETE", "/api/admin/specialty-templates/{unused_template_id}", "admin", None, 204, 3),
+    ("GET", "/api/admin/specialties", "admin", None, 200, 2),
+    ("POST", "/api/admin/specialties", "admin",
+     {"template_id": "{unused_template_id}", "spo_id": "{spo_id}"}, 201, 2),
+    ("DELETE", "/api/admin/specialties/{specialty_id}", "admin", None, 204, 3),
+    ("GET", "/api/admin/profiles/{request_id}", "admin", None, 404, 1),
+]
+
+OPERATOR_BUDGETS = [
+    ("GET", "/api/specialties", "operator", None, 200, 2),
+    ("GET", "/api/students", "operator", None, 200, 2),
+    ("POST", "/api/students", "operator",
+     {"specialty_id": "{specialty_id}", "first_name": "Олег", "last_name": "Кузнецов",
+      "certificate_number": "7777777777"}, 201, 4),
+    ("PUT", "/api/students/{student_id}", "operator", {"first_name": "Пётр"}, 200, 2),
+    ("DELETE", "/api/students/{student_id}", "operator", None, 204, 3),
+    ("POST", "/api/students/batch", "operator", {"delete_ids": ["{second_student_id}"]}, 200, 3),
+]
+
+STATS_BUDGETS = [
+    ("GET", "/api/stats", "admin", None, 200, 3),
+    ("GET", "/api/stats", "operator", None, 200, 3),
+]
+
+
+def _fill(value, ids):
+    """Substitute fixture ids into url templates and request bodies."""
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [_fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    return value
+
+
+@pytest.mark.parametrize(
+    "method,url,role,body,expected_status,budget",
+    [
+        pytest.param(*case, id=f"{case[0]} {case[1]} ({case[2]})")
+        for case in ADMIN_BUDGETS + OPERATOR_BUDGETS + STATS_BUDGETS
+    ],
+)
+async def test_query_budget(request_queries, populated, method, url, role, body, expected_status, budget):
+    response, statements = await request_queries(
+        method,
+        _fill(url, populated),
+        json=_fill(body, populated),
+        headers={"Authorization": f"Bearer {populated[role]}"},
+    )
+    assert response.status_code == expected_status, response.text
+
+    listing = "\n".join(f"  {statement}" for statement in statements)
+    assert len(statements) <= budget, (
+        f"{method} {url} executed {len(statements)} statements, budget is {budget}:\n{listing}"
+    )
+
+
+def test_every_endpoint_has_a_budget():
+    """New admin, operator or stats routes must declare a budget."""
+    from app.api import admin, operator, stats
+
+    declared = [(method, url) for method, url, *_ in ADMIN_BUDGETS + OPERATOR_BUDGETS + STATS_BUDGETS]
+    for router in (admin.router, operator.router, stats.router):
+        for route in router.routes:
+            for method in route.methods:
+                assert any(
+                    declared_method == method and _matches(url, route.path)
+                    for declared_method, url in declared
+                ), f"{method} {route.path} has no query budget"
+
+
+def _matches(template: str, path: str) -> bool:
+    """Compare a budget url with a route path, treating every {placeholder} as equal."""
+    template_parts, path_parts = template.split("/"), path.split("/")
+    return len(template_parts) == len(path_parts) and all(
+        a == b or (a.startswith("{") and b.startswith("{"))
+        for a, b in zip(template_parts, path_parts)
+    )
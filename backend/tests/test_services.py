@@ -6,10 +6,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.user_service import (
     generate_login,
+    allocate_logins,
     generate_password,
     authenticate_user,
+    provision_operators,
 )
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, verify_password
 from app.models import User, UserRole
 
 
@@ -58,6 +60,31 @@ async def test_generate_login_straight_quotes(db_session: AsyncSession):
     assert login.startswith("donskoy")
 
 
+@pytest.mark.asyncio
+async def test_allocate_logins_unique_within_batch(db_session: AsyncSession):
+    user = User(
+        login="testovoe_spo",
+        password_hash=get_password_hash("test"),
+        role=UserRole.OPERATOR,
+    )
+    db_session.add(user)
+    await db_session.commit()
+
+    logins = await allocate_logins(db_session, ["Тестовое СПО", "Тестовое СПО", "!!!"])
+    assert logins == ["testovoe_spo_1", "testovoe_spo_2", "operator"]
+
+
+@pytest.mark.asyncio
+async def test_provision_operators(db_session: AsyncSession, spo):
+    created = await provision_operators(db_session, [(spo.id, spo.name)])
+    assert len(created) == 1
+    user, password = created[0]
+    assert user.id is not None
+    assert user.spo_id == spo.id
+    assert user.role == UserRole.OPERATOR
+    assert verify_password(password, user.password_hash)
+
+
 @pytest.mark.asyncio
 async def test_generate_password():
     pwd = generate_password()
@@ -100,3 +127,142 @@ async def test_authenticate_user_wrong_password(db_session: AsyncSession):
 async def test_authenticate_user_not_found(db_session: AsyncSession):
     result = await authenticate_user(db_session, "nonexistent", "any")
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_authenticate_user_upgrades_outdated_hash(db_session: AsyncSession, monkeypatch):
+    from app.core import security
+
+    # Stored with a lower cost than the current policy
+    old_hash = security.build_password_context(bcrypt_rounds=4).hash("secret")
+    monkeypatch.setattr(security, "pwd_context", security.build_password_context(bcrypt_rounds=5))
+    user = User(login="rehash_test", password_hash=old_hash, role=UserRole.OPERATOR)
+    db_session.add(user)
+    await db_session.commit()
+
+    result = await authenticate_user(db_session, "rehash_test", "secret")
+    assert result is not None
+    await db_session.refresh(user)
+    assert user.password_hash != old_hash
+    assert user.password_hash.startswith("$2b$05$")
+    assert security.verify_password("secret", user.password_hash)
+
+    # Up-to-date hash is left alone
+    current_hash = user.password_hash
+    assert await authenticate_user(db_session, "rehash_test", "secret") is not None
+    await db_session.refresh(user)
+    assert user.password_hash == current_hash
+
+
+def test_build_password_context_rejects_unknown_scheme():
+    from app.core.security import build_password_context
+
+    with pytest.raises(ValueError):
+        build_password_context("md5")
+
+
+@pytest.mark.asyncio
+async def test_ensure_admin_from_env_skips_bcrypt_after_restart(db_session: AsyncSession, monkeypatch):
+    from app.core.config import settings
+    from app.services import user_service
+
+    monkeypatch.setattr(settings, "ADMIN_LOGIN", "env_admin")
+    monkeypatch.setattr(settings, "ADMIN_PASSWORD", "env-password")
+    assert await user_service.ensure_admin_from_env(db_session) == "created"
+
+    # Next boot: the admin exists, no hashing at all on the startup path
+    async def fail(*args):
+        pytest.fail("password hashed on the startup path")
+
+    monkeypatch.setattr(user_service, "verify_and_update_password_async", fail)
+    monkeypatch.setattr(user_service, "get_password_hash_async", fail)
+    assert await user_service.ensure_admin_from_env(db_session) == "unchanged"
+
+    monkeypatch.setattr(settings, "ADMIN_LOGIN", "renamed_admin")
+    assert await user_service.ensure_admin_from_env(db_session) == "updated"
+    assert (await user_service.get_user_by_login(db_session, "renamed_admin")) is not None
+
+
+@pytest.mark.asyncio
+async def test_sync_admin_password_from_env_applies_changed_password(db_session: AsyncSession, monkeypatch):
+    from app.core.config import settings
+    from app.services import ensure_admin_from_env, sync_admin_password_from_env
+
+    monkeypatch.setattr(settings, "ADMIN_LOGIN", "env_admin")
+    monkeypatch.setattr(settings, "ADMIN_PASSWORD", "env-password")
+    assert await ensure_admin_from_env(db_session) == "created"
+    assert await sync_admin_password_from_env(db_session) == "unchanged"
+
+    monkeypatch.setattr(settings, "ADMIN_PASSWORD", "new-password")
+    assert await sync_admin_password_from_env(db_session) == "updated"
+    assert await authenticate_user(db_session, "env_admin", "new-password") is not None
+    assert await sync_admin_password_from_env(db_session) == "unchanged"
+
+
+@pytest.mark.asyncio
+async def test_startup_does_not_wait_for_admin_password_check(engine, monkeypatch):
+    import asyncio
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app import main
+    from app.core.config import settings
+    from app.services import user_service
+
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(main, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(main, "_admin_password_task", None)
+    monkeypatch.setattr(settings, "ADMIN_LOGIN", "env_admin")
+    monkeypatch.setattr(settings, "ADMIN_PASSWORD", "env-password")
+    await main.create_initial_admin()
+    assert main._admin_password_task is None  # just created, nothing to verify
+
+    # Restart with a changed password: startup returns while bcrypt is still pending
+    monkeypatch.setattr(settings, "ADMIN_PASSWORD", "new-password")
+    release = asyncio.Event()
+    real_verify = user_service.verify_and_update_password_async
+
+    async def gated(*args):
+        await release.wait()
+        return await real_verify(*args)
+
+    monkeypatch.setattr(user_service, "verify_and_update_password_async", gated)
+    await main.create_initial_admin()
+    task = main._admin_password_task
+    assert task is not None and not task.done()
+
+    release.set()
+    await task
+    async with sessions() as db:
+        assert await authenticate_user(db, "env_admin", "new-password") is not None
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision(engine):
+    from sqlalchemy import text
+    from app.core.database import check_schema_revision, get_alembic_head
+
+    # Tables created by create_all, never migrated: the upgrade stamps them as 004 first
+    with pytest.raises(RuntimeError, match="run 'alembic upgrade head', which stamps it as revision 004"):
+        await check_schema_revision(engine)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        await conn.execute(text("INSERT INTO alembic_version VALUES ('001')"))
+    with pytest.raises(RuntimeError, match="run 'alembic upgrade head'"):
+        await check_schema_revision(engine)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": get_alembic_head()})
+    await check_schema_revision(engine)
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_empty_database():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.core.database import check_schema_revision
+
+    empty = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        with pytest.raises(RuntimeError, match="at revision None.*run 'alembic upgrade head'"):
+            await check_schema_revision(empty)
+    finally:
+        await empty.dispose()
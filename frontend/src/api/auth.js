@@ -6,6 +6,10 @@ export const authApi = {
     return response.data
   },
 
+  async logout(refreshToken) {
+    await api.post('/auth/logout', { refresh_token: refreshToken })
+  },
+
   async me() {
     const response = await api.get('/auth/me')
     return response.data
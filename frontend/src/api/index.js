@@ -22,14 +22,53 @@ api.interceptors.request.use(
   }
 )
 
+// Обновление access-токена по refresh-токену (один запрос на все параллельные 401)
+let refreshPromise = null
+
+function refreshTokens() {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refresh_token')
+    refreshPromise = axios
+      .post('/api/auth/refresh', { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token)
+        localStorage.setItem('refresh_token', response.data.refresh_token)
+        return response.data.access_token
+      })
+      .finally(() => {
+        refreshPromise = null
+      })
+  }
+  return refreshPromise
+}
+
+function clearSession() {
+  localStorage.removeItem('token')
+  localStorage.removeItem('refresh_token')
+  // Use Vue Router for navigation instead of hard reload (ISSUE-017)
+  router.push('/login')
+}
+
 // Response interceptor - обработка ошибок авторизации
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      localStorage.removeItem('token')
-      // Use Vue Router for navigation instead of hard reload (ISSUE-017)
-      router.push('/login')
+  async (error) => {
+    const original = error.config
+    const isAuthRequest = original?.url?.startsWith('/auth/login') || original?.url?.startsWith('/auth/refresh')
+
+    if (error.response?.status === 401 && !isAuthRequest) {
+      if (original._retried || !localStorage.getItem('refresh_token')) {
+        clearSession()
+        return Promise.reject(error)
+      }
+      original._retried = true
+      try {
+        const token = await refreshTokens()
+        original.headers.Authorization = `Bearer ${token}`
+        return api(original)
+      } catch {
+        clearSession()
+      }
     }
     return Promise.reject(error)
   }
@@ -8,8 +8,12 @@ export const operatorApi = {
   },
 
   // Студенты
-  async getStudents(specialtyId = null) {
-    const params = specialtyId ? { specialty_id: specialtyId } : {}
+  // Сортировка и фильтры выполняются на сервере:
+  // { specialtyId, sort: 'name' | '-name' | 'certificate' | 'created_at' ..., search, limit }
+  async getStudents({ specialtyId = null, sort = 'name', search = null, limit = 1000 } = {}) {
+    const params = { sort, limit }
+    if (specialtyId) params.specialty_id = specialtyId
+    if (search) params.search = search
     const response = await api.get('/students', { params })
     return response.data
   },
@@ -27,5 +31,11 @@ export const operatorApi = {
   async deleteStudent(id) {
     const response = await api.delete(`/students/${id}`)
     return response.data
+  },
+
+  // Пакетное перемещение/удаление: { moves: [{ student_id, specialty_id }], delete_ids: [] }
+  async batchStudents(data) {
+    const response = await api.post('/students/batch', data)
+    return response.data
   }
 }
@@ -14,6 +14,7 @@ export const useAuthStore = defineStore('auth', () => {
     const response = await authApi.login(loginStr, password)
     token.value = response.access_token
     localStorage.setItem('token', response.access_token)
+    localStorage.setItem('refresh_token', response.refresh_token)
     await fetchUser()
   }
 
@@ -28,9 +29,15 @@ export const useAuthStore = defineStore('auth', () => {
   }
 
   function logout() {
+    const refreshToken = localStorage.getItem('refresh_token')
+    if (refreshToken) {
+      // Отзываем refresh-токен на сервере; ошибка не мешает выходу
+      authApi.logout(refreshToken).catch(() => {})
+    }
     user.value = null
     token.value = null
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
   }
 
   async function init() {